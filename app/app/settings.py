@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+from importlib.util import find_spec
 import os
 from pathlib import Path
 
@@ -88,14 +89,80 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # Adds connection health checks, see DB_CONN_HEALTH_CHECKS.
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Each uwsgi thread keeps its own connection open for this many
+        # seconds, so a worker uses up to UWSGI_THREADS connections and the
+        # app UWSGI_WORKERS * UWSGI_THREADS (see scripts/run.sh). Keep that
+        # below Postgres' max_connections, or the PgBouncer pool size.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Needed behind PgBouncer in transaction pooling mode.
+        'DISABLE_SERVER_SIDE_CURSORS': bool(
+            int(os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', 0))
+        ),
     }
 }
 
+# Read replicas of the primary, as a comma separated list of hosts. Safe
+# requests to the Recipe API read from one of them. Tests run against the
+# primary only, so leave this unset when running them.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))
+):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Users who change data read from the primary for this many seconds, which
+# should be above the usual replication lag. Needs a cache shared by all
+# workers, see CACHE_BACKEND.
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
+# Check reused connections before their first query in each request,
+# replacing ones the server or a proxy closed while they were idle.
+DB_CONN_HEALTH_CHECKS = bool(int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1)))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# The default in-memory cache is private to each process. Deployments with
+# several uwsgi workers must share one, e.g. memcached with
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache (see
+# docker-compose-deploy.yml).
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', 60))
+# Tokens expire AUTH_TOKEN_TTL seconds after they were created or last
+# refreshed. Tokens in use are refreshed once they are older than
+# AUTH_TOKEN_REFRESH_AFTER seconds.
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 14 * 24 * 3600))
+AUTH_TOKEN_REFRESH_AFTER = int(
+    os.environ.get('AUTH_TOKEN_REFRESH_AFTER', 24 * 3600)
+)
+# List responses are cached per user until their data changes. Changes
+# are tracked in the cache, so with a per-process cache other workers keep
+# serving the old list for up to this many seconds.
+API_LIST_CACHE_TIMEOUT = int(os.environ.get('API_LIST_CACHE_TIMEOUT', 300))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -115,6 +182,36 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The first hasher hashes new passwords; hashes made by the others are
+# upgraded on the next successful login.
+PASSWORD_HASHERS = [
+    'user.hashers.Argon2PasswordHasher',
+    'user.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+if find_spec('argon2') is None:
+    # Keep PBKDF2 where argon2-cffi is not installed.
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 102400))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 8))
+
+# Password hashes are computed by a small pool of threads per worker, so
+# a burst of logins cannot occupy every request thread with hashing.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+# Logins beyond this many hashes in flight get a 503. Each one holds its
+# request thread, so keep it below the threads per worker (UWSGI_THREADS,
+# see scripts/run.sh) to leave a thread for other requests.
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get(
+    'PASSWORD_HASH_MAX_PENDING',
+    max(1, int(os.environ.get('UWSGI_THREADS', 4)) - 1),
+))
+# Seconds a login waits for a hash to finish once the limit is reached.
+# Waiting holds the request thread too, so by default logins are turned
+# away at once.
+PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 0))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -134,7 +231,10 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
 STATIC_URL = '/static/static/'
-MEDIA_URL = '/static/media/'
+# Media is served by an authenticated view, which may hand off sending the
+# file to nginx with X-Accel-Redirect to this internal location.
+MEDIA_URL = '/api/recipe/media/'
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', '')
 
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
@@ -151,6 +251,24 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+AUTOCOMPLETE_LIMIT = int(os.environ.get('AUTOCOMPLETE_LIMIT', 10))
+AUTOCOMPLETE_MAX_LIMIT = int(os.environ.get('AUTOCOMPLETE_MAX_LIMIT', 50))
+
+RECIPE_IMPORT_CHUNK_SIZE = int(
+    os.environ.get('RECIPE_IMPORT_CHUNK_SIZE', 500)
+)
+RECIPE_EXPORT_CHUNK_SIZE = int(
+    os.environ.get('RECIPE_EXPORT_CHUNK_SIZE', 2000)
+)
+
+RECIPE_IMAGE_VARIANT_WIDTHS = [160, 480, 1080]
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40 * 1000 * 1000)
+)
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
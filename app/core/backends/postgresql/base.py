@@ -0,0 +1,18 @@
+"""
+PostgreSQL backend with health checks for persistent connections
+"""
+
+from django.db.backends.postgresql import base
+
+from core.connections import close_if_unusable
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL connection checked before its first use in a request"""
+    health_check_pending = False
+
+    def ensure_connection(self):
+        """Replace a connection the server dropped before using it"""
+        if self.health_check_pending:
+            close_if_unusable(self)
+        super().ensure_connection()
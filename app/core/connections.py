@@ -0,0 +1,27 @@
+"""
+Health checks for persistent database connections
+"""
+
+from django.conf import settings
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    """Have reused connections checked before their next query"""
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+
+    # Checking on first use spares a round trip to the databases the
+    # request does not query.
+    for connection in connections.all():
+        connection.health_check_pending = True
+
+
+def close_if_unusable(connection):
+    """Close the connection if it no longer works"""
+    connection.health_check_pending = False
+    if connection.connection is None or connection.in_atomic_block:
+        return
+    if not connection.is_usable():
+        # The connection is reopened right away.
+        connection.close()
@@ -0,0 +1,68 @@
+"""
+Django command to compare fresh and persistent database connections
+"""
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.connections import check_connections
+
+
+class Command(BaseCommand):
+    """Django command to benchmark database connection reuse"""
+    help = (
+        'Time a cheap query on a new connection per request against a '
+        'reused, health checked connection.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Number of simulated requests per mode.',
+        )
+
+    def _query(self):
+        """Run the kind of query a cheap endpoint runs"""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+
+    def _time(self, requests, reuse):
+        """Return the latency of each simulated request in milliseconds"""
+        timings = []
+        for _ in range(requests):
+            if not reuse:
+                connection.close()
+            start = time.perf_counter()
+            if reuse:
+                check_connections()
+            self._query()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return timings
+
+    def _report(self, label, timings):
+        """Write the median and 95th percentile of timings"""
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        self.stdout.write(
+            f'{label}: median {statistics.median(timings):.2f} ms, '
+            f'p95 {p95:.2f} ms'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        self._report(
+            'New connection per request',
+            self._time(options['requests'], reuse=False),
+        )
+        self._query()
+        self._report(
+            'Persistent connection with health check',
+            self._time(options['requests'], reuse=True),
+        )
+        connection.close()
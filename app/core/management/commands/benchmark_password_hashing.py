@@ -0,0 +1,50 @@
+"""
+Django command to measure password checks per second on one core
+"""
+
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the configured password hashers"""
+    help = (
+        'Time password checks with each configured hasher to estimate '
+        'logins per second per core.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=20,
+            help='Number of password checks timed per hasher.',
+        )
+
+    def _benchmark(self, hasher, rounds):
+        """Return the seconds one password check takes on average"""
+        encoded = hasher.encode('benchmark-password', hasher.salt())
+        start = time.perf_counter()
+        for _ in range(rounds):
+            hasher.verify('benchmark-password', encoded)
+
+        return (time.perf_counter() - start) / rounds
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        for index, hasher in enumerate(get_hashers()):
+            try:
+                seconds = self._benchmark(hasher, options['rounds'])
+            except ValueError as exc:
+                # Raised for hashers whose library is not installed.
+                self.stdout.write(f'{hasher.algorithm}: skipped, {exc}')
+                continue
+
+            preferred = ' (hashes new passwords)' if index == 0 else ''
+            self.stdout.write(
+                f'{hasher.algorithm}{preferred}: '
+                f'{1 / seconds:.1f} logins/sec per core, '
+                f'{seconds * 1000:.1f} ms each'
+            )
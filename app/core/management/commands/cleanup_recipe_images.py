@@ -0,0 +1,105 @@
+"""
+Django command to delete recipe image files no recipe refers to
+"""
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """Django command to delete orphaned recipe images"""
+    help = 'Delete recipe image files which no recipe refers to.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List orphaned files without deleting them.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=24,
+            help='Only delete files older than this many hours.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of files deleted between progress reports.',
+        )
+
+    def _referenced_names(self):
+        """Return the names of all images and variants in use"""
+        names = set()
+        for image, variants in Recipe.objects.exclude(image='').values_list(
+            'image',
+            'image_variants',
+        ).iterator(chunk_size=5000):
+            names.add(image)
+            for variant in variants.values():
+                names.update(variant.values())
+
+        return names
+
+    def _walk(self, path):
+        """Yield the files below path"""
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._walk(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+    def _orphans(self, referenced, cutoff):
+        """Yield paths of old enough files which are not referenced"""
+        root = os.path.join(settings.MEDIA_ROOT, 'uploads', 'recipe')
+        if not os.path.isdir(root):
+            return
+
+        for entry in self._walk(root):
+            name = os.path.relpath(entry.path, settings.MEDIA_ROOT)
+            if name.replace(os.sep, '/') in referenced:
+                continue
+            if entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                yield entry.path
+
+    def _delete(self, paths):
+        """Delete files, tolerating ones which are already gone"""
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        # Files younger than the cutoff may belong to uploads which were
+        # not committed when the referenced names were read.
+        cutoff = time.time() - options['min_age'] * 3600
+        referenced = self._referenced_names()
+
+        found = 0
+        batch = []
+        for path in self._orphans(referenced, cutoff):
+            found += 1
+            if options['dry_run']:
+                self.stdout.write(path)
+                continue
+
+            batch.append(path)
+            if len(batch) >= options['batch_size']:
+                self._delete(batch)
+                self.stdout.write(f'Deleted {found} files...')
+                batch = []
+
+        self._delete(batch)
+        action = 'Found' if options['dry_run'] else 'Deleted'
+        self.stdout.write(
+            self.style.SUCCESS(f'{action} {found} orphaned files.')
+        )
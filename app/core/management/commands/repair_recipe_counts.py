@@ -0,0 +1,89 @@
+"""
+Django command to recompute the recipe counts of tags and ingredients
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import (
+    Count,
+    OuterRef,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+class Command(BaseCommand):
+    """Django command to repair denormalized recipe counts"""
+    help = (
+        'Recompute the recipe counts of tags and ingredients from their '
+        'recipe links, fixing any which drifted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report wrong counts without fixing them.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Number of rows checked per update statement.',
+        )
+
+    def _counted_recipes(self, m2m_field):
+        """Return an expression counting the recipes linked to each row"""
+        through = m2m_field.remote_field.through
+        target = m2m_field.m2m_reverse_field_name()
+
+        return Coalesce(
+            Subquery(
+                through.objects.filter(
+                    **{target: OuterRef('pk')},
+                ).order_by().values(target).annotate(
+                    count=Count('*'),
+                ).values('count')
+            ),
+            0,
+        )
+
+    def _repair(self, model, field, batch_size, dry_run):
+        """Fix the wrong counts of model in id ranges, returning how many"""
+        expected = self._counted_recipes(Recipe._meta.get_field(field))
+        ids = model.objects.order_by('pk').values_list('pk', flat=True)
+        fixed = 0
+        start = 0
+        while True:
+            # Short statements keep row locks brief on large tables.
+            end = ids.filter(pk__gt=start)[batch_size - 1:batch_size].first()
+            batch = model.objects.filter(pk__gt=start)
+            if end is not None:
+                batch = batch.filter(pk__lte=end)
+            wrong = batch.exclude(recipe_count=expected)
+            if dry_run:
+                fixed += wrong.count()
+            else:
+                fixed += wrong.update(recipe_count=expected)
+            if end is None:
+                return fixed
+            start = end
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        for model, field in [(Tag, 'tags'), (Ingredient, 'ingredients')]:
+            fixed = self._repair(
+                model,
+                field,
+                options['batch_size'],
+                options['dry_run'],
+            )
+            action = 'Found' if options['dry_run'] else 'Fixed'
+            self.stdout.write(self.style.SUCCESS(
+                f'{action} {fixed} wrong {model._meta.verbose_name} counts.'
+            ))
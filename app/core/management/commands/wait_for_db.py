@@ -2,27 +2,135 @@
 Django command to wait for postgresdb creation in Docker
 """
 
+import random
 import time
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.conf import settings
+from django.core.cache import caches
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    connections,
+)
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+
+CACHE_CHECK_KEY = 'wait-for-db'
 
 
 class Command(BaseCommand):
-    """Django command to wiat for database"""
+    """Django command to wait for database"""
+    help = (
+        'Wait until the databases, and optionally caches and migrations, '
+        'are ready, retrying with exponential backoff.'
+    )
 
-    def handle(self, *args, **kwargs):
-        """Entrypoint for command"""
-        self.stdout.write('Waiting for db...')
-        db_up = False
-        while db_up is False:
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            help=(
+                'Database alias to wait for, repeat for several. Defaults '
+                'to all configured databases.'
+            ),
+        )
+        parser.add_argument(
+            '--cache',
+            action='append',
+            dest='caches',
+            default=[],
+            help='Cache alias to wait for, repeat for several.',
+        )
+        parser.add_argument(
+            '--migrations',
+            action='store_true',
+            help=(
+                'Also wait until all migrations are applied to the default '
+                'database, e.g. by another container.'
+            ),
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60,
+            help='Seconds to wait in total before failing.',
+        )
+        parser.add_argument(
+            '--max-delay',
+            type=float,
+            default=5,
+            help='Longest wait between two attempts in seconds.',
+        )
+
+    def _database_ready(self, alias):
+        """Return whether a connection to the database can be opened"""
+        connections[alias].ensure_connection()
+        return True
+
+    def _cache_ready(self, alias):
+        """Return whether a value can be stored in the cache"""
+        cache = caches[alias]
+        try:
+            cache.set(CACHE_CHECK_KEY, True, 10)
+            return cache.get(CACHE_CHECK_KEY, False)
+        except Exception:
+            # Each cache backend raises its client library's errors.
+            return False
+
+    def _migrations_applied(self):
+        """Return whether the default database has all migrations"""
+        executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+        targets = executor.loader.graph.leaf_nodes()
+
+        return not executor.migration_plan(targets)
+
+    def _wait(self, label, ready, deadline, max_delay):
+        """Call ready until it returns True or the deadline passes"""
+        attempt = 0
+        while True:
             try:
-                self.check(databases=['default'])
-                db_up = True
+                if ready():
+                    return
             except (Psycopg2Error, OperationalError):
-                self.stdout.write('Db unavailable, waiting 1 second...')
-                time.sleep(1)
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CommandError(f'{label} unavailable, giving up.')
+
+            # Full jitter keeps containers started together from retrying
+            # in step.
+            delay = random.uniform(0, min(max_delay, 0.1 * 2 ** attempt))
+            delay = min(delay, remaining)
+            attempt += 1
+            self.stdout.write(
+                f'{label} unavailable, waiting {delay:.2f} seconds...'
+            )
+            time.sleep(delay)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        deadline = time.monotonic() + options['timeout']
+        checks = [
+            (f'Db {alias}', lambda alias=alias: self._database_ready(alias))
+            for alias in options['databases'] or settings.DATABASES
+        ]
+        checks.extend(
+            (f'Cache {alias}', lambda alias=alias: self._cache_ready(alias))
+            for alias in options['caches']
+        )
+        if options['migrations']:
+            checks.append(('Migrations', self._migrations_applied))
+
+        self.stdout.write('Waiting for db...')
+        for label, ready in checks:
+            self._wait(label, ready, deadline, options['max_delay'])
 
         self.stdout.write(self.style.SUCCESS('Db available!'))
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-17 23:59
+
+from django.db import migrations
+from django.db.models import (
+    Count,
+    Min,
+)
+
+
+def merge_duplicates(apps, schema_editor):
+    """Merge tags and ingredients sharing a user and name into the oldest"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in [('Tag', 'tags'), ('Ingredient', 'ingredients')]:
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        target = f'{model_name.lower()}_id'
+        duplicates = model.objects.values('user_id', 'name').annotate(
+            keep=Min('id'),
+            count=Count('id'),
+        ).filter(count__gt=1)
+
+        for duplicate in duplicates.iterator():
+            others = model.objects.filter(
+                user_id=duplicate['user_id'],
+                name=duplicate['name'],
+            ).exclude(id=duplicate['keep'])
+            recipe_ids = through.objects.filter(
+                **{f'{target}__in': others},
+            ).values_list('recipe_id', flat=True).distinct()
+            through.objects.bulk_create(
+                [
+                    through(recipe_id=recipe_id, **{target: duplicate['keep']})
+                    for recipe_id in recipe_ids
+                ],
+                ignore_conflicts=True,
+            )
+            others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_tag_ingredient_name_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
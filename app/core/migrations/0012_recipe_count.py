@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-18 00:03
+
+from django.db import migrations, models
+from django.db.models import (
+    Count,
+    OuterRef,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
+
+
+def count_recipes(apps, schema_editor):
+    """Set the recipe counts of existing tags and ingredients"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in [('Tag', 'tags'), ('Ingredient', 'ingredients')]:
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        target = model_name.lower()
+        model.objects.update(recipe_count=Coalesce(
+            Subquery(
+                through.objects.filter(
+                    **{target: OuterRef('pk')},
+                ).order_by().values(target).annotate(
+                    count=Count('*'),
+                ).values('count')
+            ),
+            0,
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_user_name_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-recipe_count'], name='ingredient_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count'], name='tag_user_count_idx'),
+        ),
+    ]
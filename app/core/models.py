@@ -5,6 +5,8 @@ Database models
 import os
 import uuid
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import (
@@ -59,9 +61,11 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 class Recipe(models.Model):
     """Recipe object"""
+    # Indexed by the composite index leading with user below.
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -71,6 +75,17 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_variants = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Weighted title and description lexemes, maintained by a database
+    # trigger (see migration 0008) so bulk writes keep it up to date too.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -79,10 +94,31 @@ class Recipe(models.Model):
 class Tag(models.Model):
     """Tag for filtering recipes"""
     name = models.CharField(max_length=255)
+    # Indexed by the unique constraint leading with user below.
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
+    # Number of recipes using this, kept up to date by the recipe app's
+    # signal handlers and importer.
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Trigram indexes on name are created in migration 0009 when the
+        # pg_trgm extension is available.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='tag_user_name_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-recipe_count'],
+                name='tag_user_count_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -91,10 +127,31 @@ class Tag(models.Model):
 class Ingredient(models.Model):
     """Ingredients for recipes"""
     name = models.CharField(max_length=255)
+    # Indexed by the unique constraint leading with user below.
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
+    # Number of recipes using this, kept up to date by the recipe app's
+    # signal handlers and importer.
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Trigram indexes on name are created in migration 0009 when the
+        # pg_trgm extension is available.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='ingredient_user_name_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-recipe_count'],
+                name='ingredient_user_count_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
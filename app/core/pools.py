@@ -0,0 +1,15 @@
+"""
+Thread pools for work done off the request threads
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+def thread_pool(name, max_workers):
+    """Create and return a thread pool for a uwsgi worker"""
+    # Threads are only started on the first submit, so pools can be
+    # created at import time, before uwsgi forks its workers.
+    return ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix=name,
+    )
@@ -0,0 +1,30 @@
+"""
+Serving API reads from database replicas
+"""
+
+from rest_framework.permissions import SAFE_METHODS
+
+from core import routers
+
+
+class ReplicaReadMixin:
+    """Read from a replica on safe requests of users who did not just
+    change data"""
+
+    def initial(self, request, *args, **kwargs):
+        """Pick a replica once the user is authenticated"""
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS and
+            not routers.is_pinned(request.user.id)
+        ):
+            routers.use_replica()
+
+    def dispatch(self, request, *args, **kwargs):
+        """Go back to the primary once the response is built"""
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Streamed responses are consumed after this and read from
+            # the primary.
+            routers.use_primary()
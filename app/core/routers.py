@@ -0,0 +1,61 @@
+"""
+Database routing for read replicas
+"""
+
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+
+state = threading.local()
+
+
+def pinned_key(user_id):
+    """Return the cache key marking the user as pinned to the primary"""
+    return f'db-primary-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Read the user's data from the primary until replicas catch up"""
+    if settings.DATABASE_REPLICAS:
+        cache.set(pinned_key(user_id), True, settings.DB_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    """Return whether the user recently changed data"""
+    return cache.get(pinned_key(user_id), False)
+
+
+def use_replica():
+    """Send reads on this thread to a replica, if any are configured"""
+    if settings.DATABASE_REPLICAS:
+        state.replica = random.choice(settings.DATABASE_REPLICAS)
+
+
+def use_primary():
+    """Send reads on this thread to the primary"""
+    state.replica = None
+
+
+class ReplicaRouter:
+    """Route reads to the replica picked for the request, all else to the
+    primary"""
+
+    def db_for_read(self, model, **hints):
+        """Return the replica in use on this thread or the primary"""
+        return getattr(state, 'replica', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        """Always write to the primary"""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations, as replicas hold the same data"""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Only migrate the primary, replicas follow it"""
+        return db == DEFAULT_DB_ALIAS
@@ -2,34 +2,321 @@
 Test custom Django management commands
 """
 
+from decimal import Decimal
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
+import os
+import tempfile
+import time
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
+from rest_framework.authtoken.models import Token
 
-@patch('core.management.commands.wait_for_db.Command.check')
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+@patch('core.management.commands.wait_for_db.connections')
 class CommandTests(SimpleTestCase):
     """Test commands"""
 
-    def test_wait_for_db_ready(self, patched_check):
+    def test_wait_for_db_ready(self, patched_connections):
         """Test waiting for database if database is ready"""
-        patched_check.return_value = True
+        call_command('wait_for_db', stdout=StringIO())
 
-        call_command('wait_for_db')
-
-        patched_check.assert_called_once_with(databases=['default'])
+        patched_connections.__getitem__.assert_called_once_with('default')
+        patched_connections['default'].ensure_connection.assert_called_once()
 
     @patch('time.sleep')
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
+    def test_wait_for_db_delay(self, patched_sleep, patched_connections):
         """Test waiting for database when getting an operational error"""
-        patched_check.side_effect = [Psycopg2Error] * 2 + \
-            [OperationalError] * 3 + [True]
+        connection = patched_connections['default']
+        connection.ensure_connection.side_effect = [Psycopg2Error] * 2 + \
+            [OperationalError] * 3 + [None]
+
+        call_command('wait_for_db', max_delay=1, stdout=StringIO())
+
+        self.assertEqual(connection.ensure_connection.call_count, 6)
+        self.assertEqual(patched_sleep.call_count, 5)
+        for (delay,), _ in patched_sleep.call_args_list:
+            self.assertLessEqual(delay, 1)
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_connections):
+        """Test giving up once the timeout passes"""
+        connection = patched_connections['default']
+        connection.ensure_connection.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+        patched_sleep.assert_not_called()
+
+    def test_wait_for_db_aliases(self, patched_connections):
+        """Test waiting for each given database alias"""
+        call_command(
+            'wait_for_db',
+            databases=['default', 'replica_0'],
+            stdout=StringIO(),
+        )
+
+        calls = patched_connections.__getitem__.call_args_list
+        self.assertEqual(
+            [args for args, _ in calls],
+            [('default',), ('replica_0',)],
+        )
+
+    def test_wait_for_cache(self, patched_connections):
+        """Test waiting for a cache"""
+        out = StringIO()
+
+        call_command('wait_for_db', caches=['default'], stdout=out)
+
+        self.assertIn('Db available!', out.getvalue())
+
+    @patch('core.management.commands.wait_for_db.caches')
+    def test_wait_for_cache_timeout(self, patched_caches, patched_connections):
+        """Test giving up on a cache which does not store values"""
+        patched_caches['default'].get.return_value = None
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'wait_for_db',
+                caches=['default'],
+                timeout=0,
+                stdout=StringIO(),
+            )
+
+    @patch('time.sleep')
+    @patch('core.management.commands.wait_for_db.MigrationExecutor')
+    def test_wait_for_migrations(
+        self,
+        patched_executor,
+        patched_sleep,
+        patched_connections,
+    ):
+        """Test waiting until migrations are applied"""
+        executor = patched_executor.return_value
+        executor.migration_plan.side_effect = [[('core', False)], []]
+
+        call_command('wait_for_db', migrations=True, stdout=StringIO())
+
+        self.assertEqual(executor.migration_plan.call_count, 2)
+        patched_sleep.assert_called_once()
+
+
+class CleanupRecipeImagesTests(TestCase):
+    """Test deleting orphaned recipe images"""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        Recipe.objects.create(
+            user=user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+            image='uploads/recipe/used.jpg',
+            image_variants={'160': {'jpeg': 'uploads/recipe/used_160.jpeg'}},
+        )
+
+    def _create_file(self, name, age_hours=48):
+        """Create a media file last modified age_hours ago"""
+        path = os.path.join(self.media_root.name, 'uploads', 'recipe', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'image')
+        mtime = time.time() - age_hours * 3600
+        os.utime(path, (mtime, mtime))
+
+        return path
+
+    def test_cleanup_deletes_old_orphans(self):
+        """Test only old files no recipe refers to are deleted"""
+        used = self._create_file('used.jpg')
+        variant = self._create_file('used_160.jpeg')
+        orphan = self._create_file('orphan.jpg')
+        nested_orphan = self._create_file('old/orphan.jpg')
+        recent = self._create_file('recent.jpg', age_hours=1)
+
+        call_command('cleanup_recipe_images', stdout=StringIO())
+
+        self.assertTrue(os.path.exists(used))
+        self.assertTrue(os.path.exists(variant))
+        self.assertTrue(os.path.exists(recent))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertFalse(os.path.exists(nested_orphan))
+
+    def test_cleanup_dry_run(self):
+        """Test a dry run lists orphans without deleting them"""
+        orphan = self._create_file('orphan.jpg')
+        out = StringIO()
+
+        call_command('cleanup_recipe_images', '--dry-run', stdout=out)
+
+        self.assertTrue(os.path.exists(orphan))
+        self.assertIn(orphan, out.getvalue())
+
+    def test_cleanup_min_age(self):
+        """Test the age threshold is configurable"""
+        orphan = self._create_file('orphan.jpg', age_hours=2)
+
+        call_command(
+            'cleanup_recipe_images',
+            '--min-age=1',
+            '--batch-size=1',
+            stdout=StringIO(),
+        )
+
+        self.assertFalse(os.path.exists(orphan))
+
+    def test_cleanup_without_media(self):
+        """Test the command succeeds before anything was uploaded"""
+        out = StringIO()
+
+        call_command('cleanup_recipe_images', stdout=out)
+
+        self.assertIn('Deleted 0 orphaned files', out.getvalue())
+
+
+class RepairRecipeCountsTests(TestCase):
+    """Test the repair_recipe_counts command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        self.tags = [
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+            for i in range(3)
+        ]
+        self.ingredient = Ingredient.objects.create(
+            user=self.user,
+            name='Salt',
+        )
+        recipe.tags.add(self.tags[0], self.tags[1])
+        recipe.ingredients.add(self.ingredient)
+        Tag.objects.filter(id=self.tags[0].id).update(recipe_count=5)
+        Tag.objects.filter(id=self.tags[2].id).update(recipe_count=2)
+        Ingredient.objects.update(recipe_count=0)
+
+    def test_repair_counts(self):
+        """Test wrong counts are recomputed in batches"""
+        out = StringIO()
+
+        call_command('repair_recipe_counts', batch_size=2, stdout=out)
+
+        self.assertEqual(
+            list(Tag.objects.order_by('id').values_list(
+                'recipe_count',
+                flat=True,
+            )),
+            [1, 1, 0],
+        )
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.ingredient.recipe_count, 1)
+        self.assertIn('Fixed 2 wrong tag counts', out.getvalue())
+        self.assertIn('Fixed 1 wrong ingredient counts', out.getvalue())
+
+    def test_repair_counts_dry_run(self):
+        """Test a dry run only reports wrong counts"""
+        out = StringIO()
+
+        call_command('repair_recipe_counts', dry_run=True, stdout=out)
+
+        self.tags[0].refresh_from_db()
+        self.assertEqual(self.tags[0].recipe_count, 5)
+        self.assertIn('Found 2 wrong tag counts', out.getvalue())
+
+
+@override_settings(AUTH_TOKEN_TTL=3600)
+class PurgeExpiredTokensTests(TestCase):
+    """Test the purge_expired_tokens command"""
+
+    def setUp(self):
+        self.tokens = []
+        for i in range(5):
+            user = get_user_model().objects.create_user(
+                f'user{i}@example.com',
+                'password123',
+            )
+            self.tokens.append(Token.objects.create(user=user))
+        Token.objects.filter(
+            key__in=[token.key for token in self.tokens[:3]],
+        ).update(created=timezone.now() - timedelta(hours=2))
+
+    def test_purge_expired_tokens(self):
+        """Test expired tokens are deleted in batches"""
+        out = StringIO()
+
+        call_command('purge_expired_tokens', batch_size=2, stdout=out)
+
+        self.assertEqual(
+            set(Token.objects.values_list('key', flat=True)),
+            {token.key for token in self.tokens[3:]},
+        )
+        self.assertIn('Deleted 3 expired tokens', out.getvalue())
+
+    def test_purge_walks_keys_once(self):
+        """Test each batch continues after the keys of the last one"""
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                'purge_expired_tokens',
+                batch_size=1,
+                stdout=StringIO(),
+            )
+
+        selects = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'ORDER BY' in query['sql']
+        ]
+        self.assertEqual(len(selects), 4)
+        expired = sorted(token.key for token in self.tokens[:3])
+        for sql, key in zip(selects[1:], expired):
+            self.assertIn(f'"key" > \'{key}\'', sql)
+        self.assertEqual(Token.objects.count(), 2)
+
+    def test_purge_dry_run(self):
+        """Test a dry run only counts expired tokens"""
+        out = StringIO()
 
-        call_command('wait_for_db')
+        call_command('purge_expired_tokens', dry_run=True, stdout=out)
 
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        self.assertEqual(Token.objects.count(), 5)
+        self.assertIn('Found 3 expired tokens', out.getvalue())
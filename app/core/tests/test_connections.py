@@ -0,0 +1,102 @@
+"""
+Tests for database connection health checks
+"""
+
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+from django.db import connection
+from django.test import (
+    SimpleTestCase,
+    override_settings,
+)
+
+from core.backends.postgresql.base import DatabaseWrapper
+from core.connections import (
+    check_connections,
+    close_if_unusable,
+)
+
+
+def mock_connection(usable=True, connected=True, in_atomic_block=False):
+    """Create and return a mock database connection"""
+    connection = MagicMock(in_atomic_block=in_atomic_block)
+    connection.connection = object() if connected else None
+    connection.is_usable.return_value = usable
+
+    return connection
+
+
+@patch('core.connections.connections')
+class ConnectionHealthCheckTests(SimpleTestCase):
+    """Test checking persistent connections at the start of requests"""
+
+    def test_checks_deferred_to_first_use(self, patched_connections):
+        """Test connections are only marked for checking"""
+        primary = mock_connection()
+        replica = mock_connection()
+        patched_connections.all.return_value = [primary, replica]
+
+        check_connections()
+
+        for conn in [primary, replica]:
+            self.assertTrue(conn.health_check_pending)
+            conn.is_usable.assert_not_called()
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=False)
+    def test_health_checks_disabled(self, patched_connections):
+        """Test no checks run when disabled"""
+        patched_connections.all.return_value = [mock_connection()]
+
+        check_connections()
+
+        patched_connections.all.assert_not_called()
+
+
+class CloseIfUnusableTests(SimpleTestCase):
+    """Test checking a connection before its first use"""
+
+    def test_unusable_connection_closed(self):
+        """Test a connection the server dropped is closed"""
+        broken = mock_connection(usable=False)
+        working = mock_connection()
+
+        close_if_unusable(broken)
+        close_if_unusable(working)
+
+        broken.close.assert_called_once()
+        working.close.assert_not_called()
+        self.assertFalse(working.health_check_pending)
+
+    def test_unopened_connection_not_checked(self):
+        """Test checking does not open connections"""
+        unopened = mock_connection(connected=False)
+
+        close_if_unusable(unopened)
+
+        unopened.is_usable.assert_not_called()
+
+    def test_connection_in_transaction_not_checked(self):
+        """Test connections inside a transaction are left alone"""
+        atomic = mock_connection(usable=False, in_atomic_block=True)
+
+        close_if_unusable(atomic)
+
+        atomic.close.assert_not_called()
+
+    def test_dropped_connection_replaced(self):
+        """Test the first query after a drop runs on a new connection"""
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict},
+            alias='health-check',
+        )
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        wrapper.connection.close()
+
+        wrapper.health_check_pending = True
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
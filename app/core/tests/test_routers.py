@@ -0,0 +1,69 @@
+"""
+Tests for routing reads to database replicas
+"""
+
+from django.core.cache import cache
+from django.test import (
+    SimpleTestCase,
+    override_settings,
+)
+
+from core import routers
+from core.models import Recipe
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0', 'replica_1'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test the replica router"""
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.addCleanup(routers.use_primary)
+        cache.clear()
+
+    def test_reads_from_primary_by_default(self):
+        """Test reads go to the primary outside of replica requests"""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_reads_from_replica(self):
+        """Test reads go to the replica picked for the request"""
+        routers.use_replica()
+
+        self.assertIn(
+            self.router.db_for_read(Recipe),
+            ['replica_0', 'replica_1'],
+        )
+
+    def test_back_to_primary(self):
+        """Test reads go to the primary again once the request is done"""
+        routers.use_replica()
+        routers.use_primary()
+
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_writes_to_primary(self):
+        """Test writes always go to the primary"""
+        routers.use_replica()
+
+        self.assertEqual(self.router.db_for_write(Recipe), 'default')
+
+    def test_migrates_primary_only(self):
+        """Test migrations only run on the primary"""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Test everything goes to the primary without replicas"""
+        routers.use_replica()
+        routers.pin_to_primary(1)
+
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+        self.assertFalse(routers.is_pinned(1))
+
+    def test_pin_to_primary(self):
+        """Test users are pinned to the primary after changing data"""
+        routers.pin_to_primary(1)
+
+        self.assertTrue(routers.is_pinned(1))
+        self.assertFalse(routers.is_pinned(2))
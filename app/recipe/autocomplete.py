@@ -0,0 +1,45 @@
+"""
+Name autocomplete for tags and ingredients
+"""
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import (
+    Case,
+    IntegerField,
+    Value,
+    When,
+)
+
+
+_trigram_enabled = {}
+
+
+def trigram_enabled(using):
+    """Return whether the pg_trgm extension is installed in the database"""
+    if using not in _trigram_enabled:
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )
+            _trigram_enabled[using] = cursor.fetchone() is not None
+
+    return _trigram_enabled[using]
+
+
+def autocomplete(queryset, q, limit):
+    """Return the names in queryset best matching q, most used first"""
+    queryset = queryset.filter(name__icontains=q).annotate(
+        prefix=Case(
+            When(name__istartswith=q, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+    ordering = ['-prefix', '-recipe_count', 'name', 'id']
+    if trigram_enabled(queryset.db):
+        # Without pg_trgm, matches are only ranked by prefix and usage.
+        queryset = queryset.annotate(similarity=TrigramSimilarity('name', q))
+        ordering.insert(1, '-similarity')
+
+    return queryset.order_by(*ordering)[:limit]
@@ -0,0 +1,150 @@
+"""
+Per-user response caching for the Recipe API
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from rest_framework.response import Response
+
+from core.routers import pin_to_primary
+
+
+def user_version_key(user_id):
+    """Return the cache key holding the user's cache version"""
+    return f'recipe-api-version:{user_id}'
+
+
+def get_user_version(user_id):
+    """Return the current cache version of the user"""
+    key = user_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, None)
+
+    return version
+
+
+def bump_user_version(user_id):
+    """Start a new cache version, orphaning the user's cached responses"""
+    cache.set(user_version_key(user_id), uuid.uuid4().hex, None)
+    # Replicas may not have the change yet, and responses read from them
+    # would be cached under the new version.
+    pin_to_primary(user_id)
+
+
+def invalidate_user_cache(user_id):
+    """Invalidate cached responses now and once the transaction commits"""
+    bump_user_version(user_id)
+    if transaction.get_connection().in_atomic_block:
+        # Responses cached from reads racing the transaction would
+        # otherwise hold the data from before the commit.
+        transaction.on_commit(lambda: bump_user_version(user_id))
+
+
+def not_modified_response(request, etag, last_modified=None):
+    """Return a 304 response if the client's copy is current"""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified,
+    )
+    if response is not None:
+        response['ETag'] = etag
+
+    return response
+
+
+class CachedListMixin:
+    """Cache list responses per user until any of their data changes"""
+
+    def _list_cache_key(self, request):
+        """Return the cache key of the list response for the request"""
+        user_id = request.user.id
+        version = get_user_version(user_id)
+        uri = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+        return f'recipe-api-list:{user_id}:{version}:{uri}'
+
+    def list(self, request, *args, **kwargs):
+        """Return the cached list response, caching it if missing"""
+        key = self._list_cache_key(request)
+        # The key changes whenever the list may have, so it also makes a
+        # strong ETag once the negotiated format is included.
+        etag = '"{}"'.format(hashlib.md5(
+            f'{key}:{request.accepted_renderer.format}'.encode()
+        ).hexdigest())
+        response = not_modified_response(request, etag)
+        if response is not None:
+            return response
+
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = super().list(request, *args, **kwargs)
+            cache.set(key, response.data, settings.API_LIST_CACHE_TIMEOUT)
+
+        response['ETag'] = etag
+        return response
+
+
+class ConditionalRetrieveMixin:
+    """Answer conditional GETs from the object's updated_at column"""
+
+    def _object_etag(self, request, pk, updated_at):
+        """Return a strong ETag for the object representation"""
+        etag = '{}-{}-{}'.format(
+            pk,
+            int(updated_at.timestamp() * 1000000),
+            request.accepted_renderer.format,
+        )
+        query = request.META.get('QUERY_STRING')
+        if query:
+            # Query parameters such as fields change the representation.
+            etag += '-' + hashlib.md5(query.encode()).hexdigest()[:12]
+
+        return f'"{etag}"'
+
+    def _conditional_response(self, request, pk, updated_at):
+        """Return a 304 response if the client's copy is current"""
+        return not_modified_response(
+            request,
+            self._object_etag(request, pk, updated_at),
+            last_modified=int(updated_at.timestamp()),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve the object, unless the client's copy is current"""
+        if ('HTTP_IF_NONE_MATCH' in request.META
+                or 'HTTP_IF_MODIFIED_SINCE' in request.META):
+            pk = self.kwargs[self.lookup_field]
+            try:
+                updated_at = self.get_queryset().prefetch_related(
+                    None,
+                ).filter(pk=pk).values_list('updated_at', flat=True).first()
+            except (ValueError, TypeError):
+                # Malformed ids are answered with a 404 by get_object.
+                updated_at = None
+            if updated_at is not None:
+                response = self._conditional_response(request, pk, updated_at)
+                if response is not None:
+                    return response
+
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        response['ETag'] = self._object_etag(
+            request,
+            instance.pk,
+            instance.updated_at,
+        )
+        response['Last-Modified'] = http_date(instance.updated_at.timestamp())
+        return response
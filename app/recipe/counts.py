@@ -0,0 +1,47 @@
+"""
+Recipe usage counts of tags and ingredients
+"""
+
+from collections import defaultdict
+
+from django.db.models import F
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+RECIPE_FIELDS = {
+    Tag: 'tags',
+    Ingredient: 'ingredients',
+}
+
+
+def recipe_links(model):
+    """Return the recipe link table of model and its column for model"""
+    m2m_field = Recipe._meta.get_field(RECIPE_FIELDS[model])
+    return m2m_field.remote_field.through, m2m_field.m2m_reverse_field_name()
+
+
+def adjust_recipe_counts(model, deltas):
+    """Add the delta mapped to each id to that object's recipe count"""
+    ids_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            ids_by_delta[delta].append(pk)
+
+    # One update per distinct delta, which is usually just +1 or -1.
+    for delta, ids in ids_by_delta.items():
+        model.objects.filter(pk__in=sorted(ids)).update(
+            recipe_count=F('recipe_count') + delta,
+        )
+
+
+def decrement_linked(model, links):
+    """Decrement the recipe count of the objects referenced by links"""
+    through, target = recipe_links(model)
+    model.objects.filter(pk__in=links.values(target)).update(
+        recipe_count=F('recipe_count') - 1,
+    )
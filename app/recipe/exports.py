@@ -0,0 +1,91 @@
+"""
+Streaming export of recipes
+"""
+
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+
+from core.models import Recipe
+
+
+RECIPE_FIELDS = [
+    'id', 'title', 'time_minutes', 'price', 'link', 'description',
+]
+
+
+class Echo:
+    """File-like object returning what is written, for csv.writer"""
+
+    def write(self, value):
+        """Return the value instead of buffering it"""
+        return value
+
+
+class RecipeExporter:
+    """Stream recipes with their tags and ingredients"""
+
+    def __init__(self, queryset, chunk_size=None):
+        self.queryset = queryset
+        self.chunk_size = chunk_size or settings.RECIPE_EXPORT_CHUNK_SIZE
+
+    def iter_recipes(self):
+        """Yield recipes as dicts, loading relations one chunk at a time"""
+        # A server-side cursor keeps memory flat however many rows match.
+        rows = self.queryset.values(*RECIPE_FIELDS).iterator(
+            chunk_size=self.chunk_size,
+        )
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+
+            recipe_ids = [recipe['id'] for recipe in chunk]
+            tags = self._related(Recipe.tags.through, 'tag', recipe_ids)
+            ingredients = self._related(
+                Recipe.ingredients.through,
+                'ingredient',
+                recipe_ids,
+            )
+            for recipe in chunk:
+                recipe['price'] = str(recipe['price'])
+                recipe['tags'] = tags.get(recipe['id'], [])
+                recipe['ingredients'] = ingredients.get(recipe['id'], [])
+                yield recipe
+
+    def _related(self, through, field, recipe_ids):
+        """Return related objects for the recipes grouped by recipe id"""
+        related = {}
+        for link in through.objects.filter(
+            recipe_id__in=recipe_ids,
+        ).values(
+            'recipe_id', f'{field}__id', f'{field}__name',
+        ).order_by(f'{field}__name'):
+            related.setdefault(link['recipe_id'], []).append({
+                'id': link[f'{field}__id'],
+                'name': link[f'{field}__name'],
+            })
+
+        return related
+
+    def iter_ndjson(self):
+        """Yield one JSON document per recipe"""
+        for recipe in self.iter_recipes():
+            yield json.dumps(recipe) + '\n'
+
+    def iter_csv(self):
+        """Yield CSV rows, with related names separated by semicolons"""
+        writer = csv.writer(Echo())
+        yield writer.writerow(RECIPE_FIELDS + ['tags', 'ingredients'])
+        for recipe in self.iter_recipes():
+            yield writer.writerow(
+                [recipe[field] for field in RECIPE_FIELDS] + [
+                    ';'.join(tag['name'] for tag in recipe['tags']),
+                    ';'.join(
+                        ingredient['name']
+                        for ingredient in recipe['ingredients']
+                    ),
+                ]
+            )
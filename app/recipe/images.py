@@ -0,0 +1,181 @@
+"""
+Resized variants of recipe images
+"""
+
+import io
+import logging
+import os
+
+from PIL import (
+    Image,
+    ImageOps,
+    features,
+)
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import (
+    connections,
+    transaction,
+)
+from django.utils import timezone
+
+from core.models import Recipe
+from core.pools import thread_pool
+from recipe.caching import invalidate_user_cache
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+if not features.check('webp'):
+    # Pillow was built without libwebp, see the Dockerfile.
+    logger.warning('Pillow cannot write WebP, rendering JPEG variants only')
+    del VARIANT_FORMATS['webp']
+
+# Variants are rendered in the background, after the upload response.
+executor = thread_pool('recipe-images', settings.RECIPE_IMAGE_WORKERS)
+
+
+def variant_name(image_name, width, extension):
+    """Return the storage name of a resized variant of an image"""
+    root = os.path.splitext(image_name)[0]
+
+    return f'{root}_{width}.{extension}'
+
+
+def variant_names(variants):
+    """Return the storage names of image variants"""
+    return [name for names in variants.values() for name in names.values()]
+
+
+def image_names(recipe):
+    """Return the storage names of a recipe image and its variants"""
+    if not recipe.image:
+        return []
+
+    return [recipe.image.name] + variant_names(recipe.image_variants)
+
+
+def find_recipe_by_image(user, name):
+    """Return the user's recipe with the given image or variant, if any"""
+    # Variants are named after the image, with a width suffix.
+    stem = os.path.basename(name).split('.')[0].split('_')[0]
+    if not stem:
+        return None
+
+    for recipe in Recipe.objects.filter(
+        user=user,
+        image__startswith=f'{os.path.dirname(name)}/{stem}',
+    ).only('image', 'image_variants'):
+        if name in image_names(recipe):
+            return recipe
+
+    return None
+
+
+def delete_files(storage, names):
+    """Delete files from storage"""
+    for name in names:
+        storage.delete(name)
+
+
+def delete_files_on_commit(storage, names):
+    """Delete files once the current transaction commits"""
+    if names:
+        transaction.on_commit(lambda: delete_files(storage, names))
+
+
+def render_variants(image_name, storage):
+    """Save resized variants of an image and return their names by width"""
+    with storage.open(image_name) as image_file:
+        img = Image.open(image_file)
+        # Let the JPEG decoder scale down while decoding when it can,
+        # keeping both sides large enough for any orientation.
+        largest = max(settings.RECIPE_IMAGE_VARIANT_WIDTHS)
+        img.draft('RGB', (largest, largest))
+        img = ImageOps.exif_transpose(img).convert('RGB')
+
+    widths = sorted(
+        (w for w in settings.RECIPE_IMAGE_VARIANT_WIDTHS if w < img.width),
+        reverse=True,
+    )
+    variants = {}
+    for width in widths:
+        # Downscale from the previous, larger variant, not the original.
+        img = img.resize(
+            (width, max(1, round(img.height * width / img.width))),
+            Image.LANCZOS,
+        )
+        variants[str(width)] = {}
+        for extension, image_format in VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            img.save(buffer, format=image_format, quality=80)
+            variants[str(width)][extension] = storage.save(
+                variant_name(image_name, width, extension),
+                ContentFile(buffer.getvalue()),
+            )
+
+    return variants
+
+
+def generate_variants(recipe_id, image_name):
+    """Render the variants of a recipe image and record them"""
+    try:
+        recipe = Recipe.objects.filter(
+            pk=recipe_id,
+            image=image_name,
+        ).first()
+        if recipe is None:
+            # The image was replaced or the recipe deleted meanwhile.
+            return
+
+        variants = render_variants(image_name, recipe.image.storage)
+        updated = Recipe.objects.filter(
+            pk=recipe_id,
+            image=image_name,
+        ).update(image_variants=variants, updated_at=timezone.now())
+        if updated:
+            invalidate_user_cache(recipe.user_id)
+        else:
+            # The image was replaced while its variants were rendered.
+            delete_files(recipe.image.storage, variant_names(variants))
+    except Exception:
+        logger.exception('Generating variants of %s failed', image_name)
+
+
+def _generate_variants_in_worker(recipe_id, image_name):
+    """Generate variants, then close the worker thread's connections"""
+    try:
+        generate_variants(recipe_id, image_name)
+    finally:
+        connections.close_all()
+
+
+def enqueue_variants(recipe):
+    """Generate the variants of the recipe image once it is committed"""
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    transaction.on_commit(
+        lambda: executor.submit(
+            _generate_variants_in_worker,
+            recipe_id,
+            image_name,
+        )
+    )
+
+
+def select_variant(recipe, width=None, webp=False):
+    """Return the smallest image at least width wide, or the original"""
+    if width is not None:
+        for variant_width, names in sorted(
+            recipe.image_variants.items(),
+            key=lambda item: int(item[0]),
+        ):
+            if int(variant_width) >= width:
+                return names['webp' if webp and 'webp' in names else 'jpeg']
+
+    # Variants are only made narrower than the original.
+    return recipe.image.name
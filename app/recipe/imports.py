@@ -0,0 +1,180 @@
+"""
+Bulk import of recipes
+"""
+
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.db import (
+    DatabaseError,
+    transaction,
+)
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.caching import invalidate_user_cache
+from recipe.counts import (
+    adjust_recipe_counts,
+    recipe_links,
+)
+from recipe.serializers import RecipeImportSerializer
+
+
+class RecipeImporter:
+    """Validate and insert recipes for a user in chunks"""
+
+    def __init__(self, user, chunk_size=None):
+        self.user = user
+        self.chunk_size = chunk_size or settings.RECIPE_IMPORT_CHUNK_SIZE
+        # A single instance validates every item, so its fields are only
+        # built once per import.
+        self._serializer = RecipeImportSerializer()
+        self._reset_cache()
+
+    def _reset_cache(self):
+        """Forget tags and ingredients resolved so far"""
+        self._objects = {Tag: {}, Ingredient: {}}
+
+    def run(self, items):
+        """Import items and return a result for each of them"""
+        items = iter(items)
+        results = []
+        while True:
+            chunk = list(islice(items, self.chunk_size))
+            if not chunk:
+                break
+            results.extend(self._import_chunk(len(results), chunk))
+
+        return results
+
+    def _import_chunk(self, offset, items):
+        """Import one chunk of items inside a transaction"""
+        results = []
+        valid = []
+        for index, item in enumerate(items, start=offset):
+            try:
+                valid.append((index, self._serializer.run_validation(item)))
+            except ValidationError as exc:
+                results.append({
+                    'index': index,
+                    'status': 'error',
+                    'errors': exc.detail,
+                })
+
+        try:
+            with transaction.atomic():
+                recipes = self._create_recipes(
+                    [data for index, data in valid]
+                )
+        except DatabaseError as exc:
+            # Objects created in the rolled back chunk no longer exist.
+            self._reset_cache()
+            results.extend(
+                {
+                    'index': index,
+                    'status': 'error',
+                    'errors': {'non_field_errors': [str(exc)]},
+                }
+                for index, data in valid
+            )
+        else:
+            if recipes:
+                # Bulk inserts send no signals to invalidate cached lists.
+                invalidate_user_cache(self.user.id)
+            results.extend(
+                {'index': index, 'status': 'created', 'id': recipe.id}
+                for (index, data), recipe in zip(valid, recipes)
+            )
+
+        return sorted(results, key=lambda result: result['index'])
+
+    def _create_recipes(self, recipes_data):
+        """Insert recipes and link their tags and ingredients in bulk"""
+        related = [
+            (data.pop('tags', []), data.pop('ingredients', []))
+            for data in recipes_data
+        ]
+        recipes = Recipe.objects.bulk_create([
+            Recipe(user=self.user, **data) for data in recipes_data
+        ])
+
+        tags = self._get_or_create_objects(
+            Tag,
+            [tag['name'] for tags, _ in related for tag in tags],
+        )
+        ingredients = self._get_or_create_objects(
+            Ingredient,
+            [
+                ingredient['name']
+                for _, ingredients in related for ingredient in ingredients
+            ],
+        )
+
+        self._link(
+            Tag,
+            {
+                (recipe.id, tags[tag['name']].id)
+                for recipe, (recipe_tags, _) in zip(recipes, related)
+                for tag in recipe_tags
+            },
+        )
+        self._link(
+            Ingredient,
+            {
+                (recipe.id, ingredients[ingredient['name']].id)
+                for recipe, (_, recipe_ingredients) in zip(recipes, related)
+                for ingredient in recipe_ingredients
+            },
+        )
+
+        return recipes
+
+    def _link(self, model, links):
+        """Insert (recipe id, object id) links and count them"""
+        through, target = recipe_links(model)
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, **{f'{target}_id': obj_id})
+            for recipe_id, obj_id in links
+        ])
+        # Bulk inserts send no m2m_changed for the counting receivers.
+        adjust_recipe_counts(
+            model,
+            Counter(obj_id for recipe_id, obj_id in links),
+        )
+
+    def _get_or_create_objects(self, model, names):
+        """Return a name to object mapping, resolving each name once"""
+        objects = self._objects[model]
+        missing = set(names) - objects.keys()
+        if missing:
+            objects.update(
+                (obj.name, obj)
+                for obj in model.objects.filter(
+                    user=self.user,
+                    name__in=missing,
+                )
+            )
+            missing -= objects.keys()
+
+        if missing:
+            # Skip names a concurrent request created first, then read
+            # back the rows the database holds.
+            model.objects.bulk_create(
+                [model(user=self.user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            objects.update(
+                (obj.name, obj)
+                for obj in model.objects.filter(
+                    user=self.user,
+                    name__in=missing,
+                )
+            )
+
+        return objects
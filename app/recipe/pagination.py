@@ -0,0 +1,31 @@
+"""
+Pagination for the Recipe API
+"""
+
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    """Keyset pagination with a client adjustable, capped page size"""
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class RecipeCursorPagination(BaseCursorPagination):
+    """Paginate recipes from the newest, or by rank when searching"""
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        """Order ranked search results from the best match"""
+        if 'rank' in queryset.query.annotations:
+            return ('-rank', '-id')
+
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(BaseCursorPagination):
+    """Paginate tags and ingredients by name"""
+    ordering = ('-name', 'id')
@@ -0,0 +1,41 @@
+"""
+Parsers for the Recipe API
+"""
+
+import json
+
+from django.conf import settings
+
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parse newline delimited JSON lazily, one item per line.
+
+    Lines which are not valid JSON are passed through as text so they are
+    reported as invalid items instead of failing the whole request.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Return a generator of the items read from the stream"""
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        return self._iter_items(stream, encoding)
+
+    def _iter_items(self, stream, encoding):
+        """Yield decoded items, skipping blank lines"""
+        if stream is None:
+            return
+
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line.decode(encoding))
+            except ValueError:
+                # Also raised for bytes which are invalid in the encoding.
+                yield line.decode(encoding, errors='replace')
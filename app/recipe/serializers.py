@@ -2,16 +2,70 @@
 Serializers for Recipe API
 """
 
+from collections import OrderedDict
+
+from django.db.models.signals import m2m_changed
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
 )
+from recipe.images import (
+    delete_files_on_commit,
+    image_names,
+)
+
+
+def parse_field_list(value):
+    """Return the set of names in a comma separated parameter, if given"""
+    if value is None:
+        return None
+
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Trim read responses to the fields and expand query parameters"""
+
+    def _is_root(self):
+        """Return whether this serializes the top level of the response"""
+        return self.root is self or self.root is self.parent
+
+    def get_fields(self):
+        """Return the fields requested by a read request"""
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if (request is None or request.method not in SAFE_METHODS
+                or not self._is_root()):
+            return fields
+
+        requested = parse_field_list(request.query_params.get('fields'))
+        if requested is not None:
+            fields = OrderedDict(
+                (name, field) for name, field in fields.items()
+                if name in requested
+            )
 
+        expanded = parse_field_list(request.query_params.get('expand'))
+        if expanded is not None:
+            # Relations which are not expanded are returned as their ids.
+            for name in getattr(self.Meta, 'expandable', []):
+                if name in fields and name not in expanded:
+                    fields[name] = serializers.PrimaryKeyRelatedField(
+                        many=True,
+                        read_only=True,
+                    )
 
-class IngredientSerializer(serializers.ModelSerializer):
+        return fields
+
+
+class IngredientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for ingredients"""
 
     class Meta:
@@ -20,7 +74,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for tags"""
 
     class Meta:
@@ -29,7 +83,23 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializer for ingredients with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+
+
+class TagCountSerializer(TagSerializer):
+    """Serializer for tags with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for recipes"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -41,33 +111,119 @@ class RecipeSerializer(serializers.ModelSerializer):
             'ingredients'
         ]
         read_only_fields = ['id']
+        expandable = ['tags', 'ingredients']
 
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for a detial view of a recipe"""
+    image_variants = serializers.SerializerMethodField()
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_variants',
+        ]
 
-    def _get_or_create_tags(self, tags, recipe):
-        """Handle getting or creating tags as needed"""
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_image_variants(self, recipe):
+        """Return URLs of the resized image variants by width and format"""
+        request = self.context.get('request')
+        storage = recipe.image.storage
+        variants = {}
+        for width, names in recipe.image_variants.items():
+            variants[width] = {}
+            for extension, name in names.items():
+                url = storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[width][extension] = url
+
+        return variants
+
+    def _get_or_create_objects(self, model, items):
+        """Return user's objects matching items, creating missing ones"""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
+        names = list(dict.fromkeys(item['name'] for item in items))
+        objects = {
+            obj.name: obj
+            for obj in model.objects.filter(user=auth_user, name__in=names)
+        }
+
+        missing = [name for name in names if name not in objects]
+        if missing:
+            # Names are unique per user, so rows a concurrent request
+            # created first are skipped and read back instead.
+            model.objects.bulk_create(
+                [model(user=auth_user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            objects.update(
+                (obj.name, obj)
+                for obj in model.objects.filter(
+                    user=auth_user,
+                    name__in=missing,
+                )
+            )
+
+        return [objects[name] for name in names]
+
+    def _add_related(self, recipe, field, objs):
+        """Link objects to the recipe with a single insert"""
+        m2m_field = Recipe._meta.get_field(field)
+        through = m2m_field.remote_field.through
+        target = m2m_field.m2m_reverse_field_name()
+        through.objects.bulk_create(
+            [through(recipe=recipe, **{target: obj}) for obj in objs],
+            ignore_conflicts=True,
+        )
+        if objs:
+            self._send_m2m_changed(
+                recipe, m2m_field, 'post_add', {obj.id for obj in objs},
             )
-            recipe.tags.add(tag_obj)
+
+    def _send_m2m_changed(self, recipe, m2m_field, action, pk_set):
+        """Notify receivers of links written directly to the through table"""
+        m2m_changed.send(
+            sender=m2m_field.remote_field.through,
+            instance=recipe,
+            action=action,
+            reverse=False,
+            model=m2m_field.related_model,
+            pk_set=pk_set,
+            using=recipe._state.db,
+        )
+
+    def _set_related(self, recipe, field, objs):
+        """Link the recipe to exactly objs, touching only changed links"""
+        m2m_field = Recipe._meta.get_field(field)
+        through = m2m_field.remote_field.through
+        target = m2m_field.m2m_reverse_field_name()
+        current = {obj.id for obj in getattr(recipe, field).all()}
+        wanted = {obj.id for obj in objs}
+
+        removed = current - wanted
+        if removed:
+            self._send_m2m_changed(recipe, m2m_field, 'pre_remove', removed)
+            through.objects.filter(
+                recipe=recipe,
+                **{f'{target}__in': removed},
+            ).delete()
+            self._send_m2m_changed(recipe, m2m_field, 'post_remove', removed)
+
+        self._add_related(
+            recipe,
+            field,
+            [obj for obj in objs if obj.id not in current],
+        )
+
+    def _get_or_create_tags(self, tags, recipe):
+        """Handle getting or creating tags as needed"""
+        tag_objs = self._get_or_create_objects(Tag, tags)
+        self._add_related(recipe, 'tags', tag_objs)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating ingredients as needed"""
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        ingredient_objs = self._get_or_create_objects(Ingredient, ingredients)
+        self._add_related(recipe, 'ingredients', ingredient_objs)
 
     def create(self, validated_data):
         """Create a recipe"""
@@ -84,12 +240,15 @@ class RecipeDetailSerializer(RecipeSerializer):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            tag_objs = self._get_or_create_objects(Tag, tags)
+            self._set_related(instance, 'tags', tag_objs)
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            ingredient_objs = self._get_or_create_objects(
+                Ingredient,
+                ingredients,
+            )
+            self._set_related(instance, 'ingredients', ingredient_objs)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -98,6 +257,13 @@ class RecipeDetailSerializer(RecipeSerializer):
         return instance
 
 
+class RecipeImportSerializer(RecipeSerializer):
+    """Serializer for validating recipes in a bulk import"""
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['description']
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading iamges to recipes"""
 
@@ -106,3 +272,13 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image']
         read_only_fields = ['id']
         extra_kwargs = {'image': {'required': 'True'}}
+
+    def update(self, instance, validated_data):
+        """Replace the image, deleting the previous files after commit"""
+        previous = image_names(instance)
+        # Variants of the previous image no longer apply.
+        instance.image_variants = {}
+        recipe = super().update(instance, validated_data)
+        delete_files_on_commit(recipe.image.storage, previous)
+
+        return recipe
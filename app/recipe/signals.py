@@ -0,0 +1,136 @@
+"""
+Signal handlers for the recipe app
+"""
+
+from django.db.models.signals import (
+    post_save,
+    pre_delete,
+    post_delete,
+    m2m_changed,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.caching import invalidate_user_cache
+from recipe.counts import (
+    adjust_recipe_counts,
+    decrement_linked,
+    recipe_links,
+)
+from recipe.images import (
+    delete_files_on_commit,
+    image_names,
+)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_on_change(sender, instance, **kwargs):
+    """Invalidate cached responses of the owner of a changed object"""
+    invalidate_user_cache(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_links_change(sender, instance, action, **kwargs):
+    """Invalidate cached responses when recipe links change"""
+    if action.startswith('post_'):
+        invalidate_user_cache(instance.user_id)
+
+
+RECIPE_FIELDS = {
+    Tag: 'tags',
+    Ingredient: 'ingredients',
+    Recipe.tags.through: 'tags',
+    Recipe.ingredients.through: 'ingredients',
+}
+
+
+def touch_recipes(**filters):
+    """Mark matching recipes as updated, changing their ETags"""
+    Recipe.objects.filter(**filters).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_on_links_change(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """Mark recipes whose tags or ingredients changed as updated"""
+    if not reverse:
+        if action.startswith('post_'):
+            touch_recipes(pk=instance.pk)
+    elif action == 'pre_clear':
+        touch_recipes(**{RECIPE_FIELDS[sender]: instance})
+    elif action in ['post_add', 'post_remove']:
+        touch_recipes(pk__in=pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def touch_on_rename(sender, instance, created, **kwargs):
+    """Mark recipes showing a changed tag or ingredient as updated"""
+    if not created:
+        touch_recipes(**{RECIPE_FIELDS[sender]: instance})
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_on_delete(sender, instance, **kwargs):
+    """Mark recipes losing a tag or ingredient as updated"""
+    touch_recipes(**{RECIPE_FIELDS[sender]: instance})
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_on_links_change(sender, instance, action, reverse, model, pk_set,
+                          **kwargs):
+    """Keep recipe counts in step with added and removed links"""
+    if reverse:
+        # The instance is a tag or ingredient, pk_set holds recipe ids.
+        counted = type(instance)
+        through, target = recipe_links(counted)
+        links = through.objects.filter(**{target: instance})
+        if action == 'post_add':
+            delta = len(pk_set)
+        elif action == 'pre_remove':
+            delta = -links.filter(recipe_id__in=pk_set).count()
+        elif action == 'pre_clear':
+            delta = -links.count()
+        else:
+            return
+        adjust_recipe_counts(counted, {instance.pk: delta})
+        return
+
+    through, target = recipe_links(model)
+    links = through.objects.filter(recipe=instance)
+    if action == 'post_add':
+        # Django and the serializers only report newly linked ids.
+        adjust_recipe_counts(model, {pk: 1 for pk in pk_set})
+    elif action == 'pre_remove':
+        # Removing ids which are not linked must not change their counts.
+        decrement_linked(model, links.filter(**{f'{target}__in': pk_set}))
+    elif action == 'pre_clear':
+        decrement_linked(model, links)
+
+
+@receiver(pre_delete, sender=Recipe)
+def count_on_recipe_delete(sender, instance, **kwargs):
+    """Decrement the counts of the tags and ingredients of a recipe"""
+    for model in [Tag, Ingredient]:
+        through, target = recipe_links(model)
+        decrement_linked(model, through.objects.filter(recipe=instance))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_files(sender, instance, **kwargs):
+    """Delete the image files of a deleted recipe after commit"""
+    delete_files_on_commit(instance.image.storage, image_names(instance))
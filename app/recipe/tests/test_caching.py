@@ -0,0 +1,281 @@
+"""
+Tests for caching of Recipe API list responses
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+BULK_URL = reverse('recipe:recipe-bulk-import')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe Title',
+        'time_minutes': 30,
+        'price': Decimal('44.99'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ListCacheTests(TestCase):
+    """Test list responses are cached per user"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_list_runs_no_queries(self):
+        """Test listing again is served from the cache"""
+        create_recipe(user=self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+        Ingredient.objects.create(user=self.user, name='Kale')
+
+        for url in [RECIPES_URL, TAGS_URL, INGREDIENTS_URL]:
+            with self.subTest(url=url):
+                res = self.client.get(url)
+
+                with self.assertNumQueries(0):
+                    cached = self.client.get(url)
+
+                self.assertEqual(cached.status_code, status.HTTP_200_OK)
+                self.assertEqual(cached.data, res.data)
+
+    def test_query_params_cached_separately(self):
+        """Test lists with different parameters do not share entries"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        create_recipe(user=self.user).tags.add(tag)
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL)
+        filtered = self.client.get(RECIPES_URL, {'tags': tag.id})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertEqual(len(filtered.data['results']), 1)
+
+    def test_save_invalidates(self):
+        """Test saving an object invalidates the owner's lists"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+
+        tag.name = 'Dinner'
+        tag.save()
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data['results'][0]['name'], 'Dinner')
+
+    def test_delete_invalidates(self):
+        """Test deleting an object invalidates the owner's lists"""
+        recipe = create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+
+        recipe.delete()
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_links_change_invalidates(self):
+        """Test changing recipe tags invalidates the owner's lists"""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPES_URL)
+
+        recipe.tags.add(tag)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'Vegan')
+
+    def test_api_update_invalidates(self):
+        """Test updating recipe tags through the API invalidates lists"""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        self.client.get(RECIPES_URL)
+        self.client.get(TAGS_URL)
+
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        self.client.patch(url, {'tags': [{'name': 'Dinner'}]}, format='json')
+        recipes = self.client.get(RECIPES_URL)
+        tags = self.client.get(TAGS_URL)
+
+        self.assertEqual(
+            recipes.data['results'][0]['tags'][0]['name'],
+            'Dinner',
+        )
+        self.assertEqual(len(tags.data['results']), 2)
+
+    def test_bulk_import_invalidates(self):
+        """Test importing recipes invalidates the owner's lists"""
+        self.client.get(RECIPES_URL)
+
+        payload = [{'title': 'Soup', 'time_minutes': 5, 'price': '2.00'}]
+        self.client.post(BULK_URL, payload, format='json')
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_other_user_changes_keep_cache(self):
+        """Test changes by another user do not invalidate the cache"""
+        create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123',
+        )
+
+        create_recipe(user=other_user)
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        self.url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+
+    def test_detail_not_modified(self):
+        """Test a current recipe is answered with 304 from one query"""
+        res = self.client.get(self.url)
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(
+                self.url,
+                HTTP_IF_NONE_MATCH=res['ETag'],
+            )
+
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached['ETag'], res['ETag'])
+
+    def test_detail_if_modified_since(self):
+        """Test If-Modified-Since is honored for recipes"""
+        res = self.client.get(self.url)
+
+        cached = self.client.get(
+            self.url,
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified'],
+        )
+
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_malformed_id(self):
+        """Test a conditional request for a malformed id is a 404"""
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=['abc']),
+            HTTP_IF_NONE_MATCH='"abc"',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_modified(self):
+        """Test a changed recipe is returned in full"""
+        res = self.client.get(self.url)
+
+        self.client.patch(self.url, {'title': 'New title'})
+        updated = self.client.get(self.url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(updated.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(updated['ETag'], res['ETag'])
+        self.assertEqual(updated.data['title'], 'New title')
+
+    def test_detail_modified_by_tag_rename(self):
+        """Test renaming a tag changes the ETag of its recipes"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        res = self.client.get(self.url)
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        updated = self.client.get(self.url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(updated.status_code, status.HTTP_200_OK)
+        self.assertEqual(updated.data['tags'][0]['name'], 'Vegetarian')
+
+    def test_detail_of_other_user_not_found(self):
+        """Test conditional requests do not reveal other users' recipes"""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123',
+        )
+        recipe = create_recipe(user=other_user)
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_etag_depends_on_fields(self):
+        """Test a sparse representation has its own ETag"""
+        res = self.client.get(self.url)
+
+        sparse = self.client.get(
+            self.url,
+            {'fields': 'id'},
+            HTTP_IF_NONE_MATCH=res['ETag'],
+        )
+
+        self.assertEqual(sparse.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(sparse['ETag'], res['ETag'])
+
+    def test_list_not_modified(self):
+        """Test unchanged lists are answered with 304 without queries"""
+        for url in [RECIPES_URL, TAGS_URL, INGREDIENTS_URL]:
+            with self.subTest(url=url):
+                res = self.client.get(url)
+
+                with self.assertNumQueries(0):
+                    cached = self.client.get(
+                        url,
+                        HTTP_IF_NONE_MATCH=res['ETag'],
+                    )
+
+                self.assertEqual(
+                    cached.status_code,
+                    status.HTTP_304_NOT_MODIFIED,
+                )
+
+    def test_list_modified(self):
+        """Test a changed list is returned in full"""
+        res = self.client.get(RECIPES_URL)
+
+        create_recipe(user=self.user)
+        updated = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(updated.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(updated.data['results']), 2)
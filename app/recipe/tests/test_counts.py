@@ -0,0 +1,142 @@
+"""
+Tests for the recipe counts of tags and ingredients
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-import')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe Title',
+        'time_minutes': 30,
+        'price': Decimal('44.99'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeCountTests(TestCase):
+    """Test recipe counts follow changes to recipe links"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        self.tag2 = Tag.objects.create(user=self.user, name='Dinner')
+
+    def assertCounts(self, *expected):
+        """Assert the recipe counts of tag1 and tag2"""
+        self.tag1.refresh_from_db()
+        self.tag2.refresh_from_db()
+        self.assertEqual(
+            (self.tag1.recipe_count, self.tag2.recipe_count),
+            expected,
+        )
+
+    def test_add_and_remove(self):
+        """Test adding and removing tags of a recipe"""
+        recipe = create_recipe(user=self.user)
+
+        recipe.tags.add(self.tag1, self.tag2)
+        recipe.tags.add(self.tag1)
+        self.assertCounts(1, 1)
+
+        recipe.tags.remove(self.tag1)
+        recipe.tags.remove(self.tag1)
+        self.assertCounts(0, 1)
+
+        recipe.tags.clear()
+        self.assertCounts(0, 0)
+
+    def test_reverse_add_and_remove(self):
+        """Test adding and removing recipes of a tag"""
+        recipe1 = create_recipe(user=self.user)
+        recipe2 = create_recipe(user=self.user)
+
+        self.tag1.recipe_set.add(recipe1, recipe2)
+        self.assertCounts(2, 0)
+
+        self.tag1.recipe_set.remove(recipe1, recipe1)
+        self.assertCounts(1, 0)
+
+        self.tag1.recipe_set.clear()
+        self.assertCounts(0, 0)
+
+    def test_delete_recipe(self):
+        """Test deleting a recipe decrements the counts of its tags"""
+        recipe1 = create_recipe(user=self.user)
+        recipe2 = create_recipe(user=self.user)
+        recipe1.tags.add(self.tag1, self.tag2)
+        recipe2.tags.add(self.tag1)
+
+        Recipe.objects.filter(id=recipe1.id).delete()
+
+        self.assertCounts(1, 0)
+
+    def test_api_create_and_update(self):
+        """Test counts of recipes created and updated through the API"""
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': Decimal('5.00'),
+            'tags': [{'name': 'Vegan'}, {'name': 'Dinner'}],
+            'ingredients': [{'name': 'Rice'}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertCounts(1, 1)
+        self.assertEqual(Ingredient.objects.get(name='Rice').recipe_count, 1)
+
+        res = self.client.patch(
+            detail_url(res.data['id']),
+            {'tags': [{'name': 'Vegan'}]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCounts(1, 0)
+
+    def test_bulk_import(self):
+        """Test counts of recipes created by a bulk import"""
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '5.50',
+                'tags': [{'name': 'Vegan'}, {'name': 'Vegan'}],
+            }
+            for i in range(3)
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCounts(3, 0)
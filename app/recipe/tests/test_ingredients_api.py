@@ -16,10 +16,12 @@ from core.models import (
     Recipe,
 )
 
+from recipe.autocomplete import trigram_enabled
 from recipe.serializers import IngredientSerializer
 
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
 
 
 def detail_url(ingredient_id):
@@ -63,7 +65,7 @@ class PrivateIngredientAPITests(TestCase):
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrieve_ingredients_limited_to_user(self):
         """
@@ -79,9 +81,10 @@ class PrivateIngredientAPITests(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
-        self.assertEqual(res.data[0]['id'], ingredient.id)
+        results = res.data['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['name'], ingredient.name)
+        self.assertEqual(results[0]['id'], ingredient.id)
 
     def test_update_ingredient(self):
         """Test updating an ingredient"""
@@ -122,8 +125,8 @@ class PrivateIngredientAPITests(TestCase):
 
         s1 = IngredientSerializer(ingredient1)
         s2 = IngredientSerializer(ingredient2)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_unique_filtered_ingredients(self):
         """Test filtered ingredients returns a unique list"""
@@ -146,4 +149,100 @@ class PrivateIngredientAPITests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_assigned_ingredients_with_counts(self):
+        """Test assigned ingredients can be listed with recipe counts"""
+        ingredient = Ingredient.objects.create(user=self.user, name='Oats')
+        Ingredient.objects.create(user=self.user, name='Spinach')
+        recipe = Recipe.objects.create(
+            title='Overnight oats',
+            time_minutes=5,
+            price=Decimal('4.50'),
+            user=self.user,
+        )
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(
+            INGREDIENTS_URL,
+            {'assigned_only': 1, 'with_counts': 1},
+        )
+
+        self.assertEqual(res.data['results'], [
+            {'id': ingredient.id, 'name': 'Oats', 'recipe_count': 1},
+        ])
+
+    def _create_recipe(self, *ingredients):
+        """Create a recipe using the given ingredients"""
+        recipe = Recipe.objects.create(
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('4.50'),
+            user=self.user,
+        )
+        recipe.ingredients.add(*ingredients)
+
+    def _names(self, res):
+        """Return the ingredient names of a response"""
+        return [ingredient['name'] for ingredient in res.data]
+
+    def test_autocomplete(self):
+        """Test ingredients containing the text are suggested"""
+        Ingredient.objects.create(user=self.user, name='Tomato')
+        Ingredient.objects.create(user=self.user, name='Cherry Tomatoes')
+        Ingredient.objects.create(user=self.user, name='Potato')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'toma'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._names(res), ['Tomato', 'Cherry Tomatoes'])
+
+    def test_autocomplete_orders_by_usage(self):
+        """Test equally good matches are ordered by how often they are used"""
+        basil = Ingredient.objects.create(user=self.user, name='Basil')
+        bay = Ingredient.objects.create(user=self.user, name='Bay')
+        self._create_recipe(basil, bay)
+        self._create_recipe(bay)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'ba'})
+
+        self.assertEqual(self._names(res), ['Bay', 'Basil'])
+
+    def test_autocomplete_orders_by_similarity(self):
+        """Test closer matches come first when pg_trgm is installed"""
+        if not trigram_enabled('default'):
+            self.skipTest('pg_trgm is not installed')
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        wine = Ingredient.objects.create(
+            user=self.user,
+            name='Rice wine vinegar',
+        )
+        self._create_recipe(wine)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'rice'})
+
+        self.assertEqual(self._names(res), [rice.name, wine.name])
+
+    def test_autocomplete_limit(self):
+        """Test the number of suggestions is limited"""
+        for i in range(5):
+            Ingredient.objects.create(user=self.user, name=f'Pepper {i}')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'pep', 'limit': 2})
+
+        self.assertEqual(len(res.data), 2)
+
+    def test_autocomplete_limited_to_user(self):
+        """Test ingredients of other users are not suggested"""
+        other_user = create_user(email='other@example.com')
+        Ingredient.objects.create(user=other_user, name='Garlic')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'gar'})
+
+        self.assertEqual(res.data, [])
+
+    def test_autocomplete_requires_text(self):
+        """Test an error is returned without text to complete"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': ' '})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
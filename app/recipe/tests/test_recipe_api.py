@@ -3,13 +3,28 @@ Tests for Recipe API
 """
 
 from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
+import io
 import os
+import struct
 import tempfile
+import zlib
 
-from PIL import Image
+from PIL import (
+    Image,
+    features,
+)
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -21,6 +36,7 @@ from core.models import (
     Ingredient,
 )
 
+from recipe.images import generate_variants
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer,
@@ -39,6 +55,11 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+def image_url(recipe_id):
+    """Create and return a recipe image URL"""
+    return reverse('recipe:recipe-image', args=[recipe_id])
+
+
 def create_recipe(user, **params):
     """Create and return a sample recipe"""
     defaults = {
@@ -93,7 +114,7 @@ class PrivateRecipeAPITests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res. data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_list_limited_to_user(self):
         """Test retrieving recipe list is limited to authenticated user"""
@@ -109,7 +130,7 @@ class PrivateRecipeAPITests(TestCase):
         recipes = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_recipe_detail(self):
         """Test get recipe detail"""
@@ -397,6 +418,44 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.ingredients.count(), 0)
 
+    @patch('recipe.pagination.RecipeCursorPagination.page_size', 2)
+    def test_recipe_list_paginated(self):
+        """Test recipe list pages through recipes from the newest"""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(3)
+        ]
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['previous'])
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipes[2].id, recipes[1].id],
+        )
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipes[0].id],
+        )
+
+    @patch('recipe.pagination.RecipeCursorPagination.max_page_size', 2)
+    def test_recipe_list_page_size_capped(self):
+        """Test requested page size is capped"""
+        for i in range(3):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        res = self.client.get(RECIPES_URL, {'page_size': 50})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
     def test_filter_by_tags(self):
         """Test filtering recipes by tags"""
         recipe1 = create_recipe(user=self.user, title='Cauliflower curry')
@@ -413,9 +472,10 @@ class PrivateRecipeAPITests(TestCase):
         s1 = RecipeSerializer(recipe1)
         s2 = RecipeSerializer(recipe2)
         s3 = RecipeSerializer(recipe3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        results = res.data['results']
+        self.assertIn(s1.data, results)
+        self.assertIn(s2.data, results)
+        self.assertNotIn(s3.data, results)
 
     def test_filter_by_ingredients(self):
         """Test filtering recipes by ingredients"""
@@ -436,9 +496,54 @@ class PrivateRecipeAPITests(TestCase):
         s1 = RecipeSerializer(recipe1)
         s2 = RecipeSerializer(recipe2)
         s3 = RecipeSerializer(recipe3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        results = res.data['results']
+        self.assertIn(s1.data, results)
+        self.assertIn(s2.data, results)
+        self.assertNotIn(s3.data, results)
+
+    def test_filter_by_tags_unique(self):
+        """Test filtering by several tags returns each recipe once"""
+        recipe = create_recipe(user=self.user, title='Vegan curry')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        recipe.tags.add(tag1, tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_by_all_tags(self):
+        """Test filtering recipes having every requested tag"""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        tag3 = Tag.objects.create(user=self.user, name='Spicy')
+        recipe1 = create_recipe(user=self.user, title='Vegan chili')
+        recipe1.tags.add(tag1, tag2, tag3)
+        recipe2 = create_recipe(user=self.user, title='Vegan salad')
+        recipe2.tags.add(tag1, tag3)
+        recipe3 = create_recipe(user=self.user, title='Steak')
+        recipe3.tags.add(tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'tags_match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipe1.id],
+        )
+
+    def test_filter_by_tags_invalid_match(self):
+        """Test an unknown tags_match value is rejected"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        params = {'tags': f'{tag.id}', 'tags_match': 'every'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags_match', res.data)
 
 
 class ImageUploadTests(TestCase):
@@ -480,3 +585,642 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_image_strips_exif(self):
+        """Test metadata is removed from uploaded images"""
+        url = image_upload_url(self.recipe.id)
+        exif = Image.Exif()
+        exif[0x010f] = 'Camera maker'
+        exif[0x0112] = 6
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            img = Image.new('RGB', (20, 10))
+            img.save(image_file, format='JPEG', exif=exif)
+            image_file.seek(0)
+            res = self.client.post(
+                url,
+                {'image': image_file},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as img:
+            self.assertEqual(dict(img.getexif()), {})
+            # The orientation was applied before it was dropped.
+            self.assertEqual(img.size, (10, 20))
+
+    def test_upload_image_rejected_by_magic_bytes(self):
+        """Test files which are not images are rejected early"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            image_file.write(b'GIF89a' + b'\0' * 1024 * 1024)
+            image_file.seek(0)
+            res = self.client.post(
+                url,
+                {'image': image_file},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def _upload_webp(self):
+        """Upload a small WebP image to the recipe"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.webp') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='WEBP')
+            image_file.seek(0)
+            return self.client.post(
+                url,
+                {'image': image_file},
+                format='multipart',
+            )
+
+    @skipIf(not features.check('webp'), 'Pillow was built without WebP')
+    def test_upload_image_webp(self):
+        """Test WebP images are accepted"""
+        res = self._upload_webp()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @skipIf(not features.check('webp'), 'Pillow was built without WebP')
+    def test_upload_image_webp_unsupported(self):
+        """Test WebP images are rejected when Pillow cannot read them"""
+        with patch('recipe.uploads.WEBP_SUPPORTED', False):
+            res = self._upload_webp()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('JPEG or PNG', str(res.data['image']))
+
+    def test_upload_image_truncated_header(self):
+        """Test an image whose header cannot be read is rejected"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.png') as image_file:
+            image_file.write(b'\x89PNG\r\n\x1a\n')
+            image_file.seek(0)
+            res = self.client.post(
+                url,
+                {'image': image_file},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=99)
+    def test_upload_image_too_many_pixels(self):
+        """Test images over the pixel cap are rejected from the header"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.png') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='PNG')
+            image_file.seek(0)
+            res = self.client.post(
+                url,
+                {'image': image_file},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('99 pixels', str(res.data['image']))
+
+    def test_upload_image_decompression_bomb(self):
+        """Test a header declaring a huge image is rejected"""
+        def chunk(kind, data):
+            body = kind + data
+            return (
+                struct.pack('>I', len(data)) + body +
+                struct.pack('>I', zlib.crc32(body))
+            )
+
+        size = struct.pack('>IIBBBBB', 20000, 20000, 8, 2, 0, 0, 0)
+        header = (
+            b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', size) +
+            chunk(b'IDAT', zlib.compress(b'')) +
+            chunk(b'IEND', b'')
+        )
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.png') as image_file:
+            image_file.write(header)
+            image_file.seek(0)
+            res = self.client.post(
+                url,
+                {'image': image_file},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(
+            f'{settings.RECIPE_IMAGE_MAX_PIXELS} pixels',
+            str(res.data['image']),
+        )
+
+    def _upload_image(self):
+        """Upload a small image to the recipe"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(
+                    url,
+                    {'image': image_file},
+                    format='multipart',
+                )
+        self.recipe.refresh_from_db()
+
+        return res
+
+    @patch('recipe.images.executor')
+    def test_replace_image_deletes_previous_files(self, mock_executor):
+        """Test replacing an image deletes the previous one on commit"""
+        self._upload_image()
+        previous = self.recipe.image.path
+        self.recipe.image_variants = {'160': {'jpeg': 'missing.jpeg'}}
+        self.recipe.save()
+
+        res = self._upload_image()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(os.path.exists(previous))
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertEqual(self.recipe.image_variants, {})
+
+    @patch('recipe.images.executor')
+    def test_delete_recipe_deletes_image(self, mock_executor):
+        """Test deleting a recipe deletes its image on commit"""
+        self._upload_image()
+        path = self.recipe.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.delete(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(path))
+
+    @patch('recipe.images.executor')
+    def test_upload_image_enqueues_variants(self, mock_executor):
+        """Test uploading an image schedules its variants after commit"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(
+                    url,
+                    {'image': image_file},
+                    format='multipart',
+                )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        mock_executor.submit.assert_called_once()
+        self.assertEqual(
+            mock_executor.submit.call_args.args[1:],
+            (self.recipe.id, self.recipe.image.name),
+        )
+
+
+class ImageVariantTests(TestCase):
+    """Tests for resized variants of recipe images"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        storage = self.recipe.image.storage
+        for names in self.recipe.image_variants.values():
+            for name in names.values():
+                storage.delete(name)
+        self.recipe.image.delete()
+
+    def _set_image(self, size):
+        """Save a JPEG image of the given size to the recipe"""
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, format='JPEG')
+        self.recipe.image.save('photo.jpg', ContentFile(buffer.getvalue()))
+
+    def test_generate_variants(self):
+        """Test variants narrower than the original are generated"""
+        self._set_image((1200, 600))
+
+        generate_variants(self.recipe.id, self.recipe.image.name)
+
+        self.recipe.refresh_from_db()
+        variants = self.recipe.image_variants
+        self.assertEqual(set(variants), {'160', '480', '1080'})
+        for width, names in variants.items():
+            self.assertEqual(set(names), {'webp', 'jpeg'})
+            with self.recipe.image.storage.open(names['webp']) as f:
+                img = Image.open(f)
+                self.assertEqual(img.format, 'WEBP')
+                self.assertEqual(img.size, (int(width), int(width) // 2))
+
+    def test_generate_variants_not_upscaled(self):
+        """Test no variant is wider than the original image"""
+        self._set_image((300, 300))
+
+        generate_variants(self.recipe.id, self.recipe.image.name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(set(self.recipe.image_variants), {'160'})
+
+    def test_generate_variants_of_replaced_image(self):
+        """Test variants of a replaced image are not recorded"""
+        self._set_image((300, 300))
+        old_name = self.recipe.image.name
+        self._set_image((300, 300))
+
+        generate_variants(self.recipe.id, old_name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+        self.recipe.image.storage.delete(old_name)
+
+    def test_detail_includes_variant_urls(self):
+        """Test the recipe detail lists the URLs of the variants"""
+        self._set_image((600, 300))
+        generate_variants(self.recipe.id, self.recipe.image.name)
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            res.data['image_variants']['480']['webp'].endswith('_480.webp')
+        )
+
+    def test_image_redirects_to_smallest_adequate_variant(self):
+        """Test the image endpoint picks the variant to download"""
+        self._set_image((1200, 600))
+        generate_variants(self.recipe.id, self.recipe.image.name)
+        self.recipe.refresh_from_db()
+        url = image_url(self.recipe.id)
+
+        webp = self.client.get(
+            url,
+            {'width': 300},
+            HTTP_ACCEPT='image/webp,*/*',
+        )
+        jpeg = self.client.get(url, {'width': 160})
+        original = self.client.get(url, {'width': 2000})
+
+        self.assertEqual(webp.status_code, status.HTTP_302_FOUND)
+        self.assertTrue(webp['Location'].endswith('_480.webp'))
+        self.assertTrue(jpeg['Location'].endswith('_160.jpeg'))
+        self.assertTrue(
+            original['Location'].endswith(self.recipe.image.name)
+        )
+
+    @patch.dict('recipe.images.VARIANT_FORMATS', clear=True, jpeg='JPEG')
+    def test_variants_without_webp_support(self):
+        """Test JPEG variants are served when Pillow cannot write WebP"""
+        self._set_image((600, 300))
+        generate_variants(self.recipe.id, self.recipe.image.name)
+        self.recipe.refresh_from_db()
+
+        res = self.client.get(
+            image_url(self.recipe.id),
+            {'width': 300},
+            HTTP_ACCEPT='image/webp,*/*',
+        )
+
+        self.assertEqual(set(self.recipe.image_variants['480']), {'jpeg'})
+        self.assertTrue(res['Location'].endswith('_480.jpeg'))
+
+    def test_image_without_upload_not_found(self):
+        """Test the image endpoint of a recipe without image"""
+        res = self.client.get(image_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeMediaTests(TestCase):
+    """Tests for serving recipe images"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        self.recipe.image.save('photo.jpg', ContentFile(b'image bytes'))
+        self.recipe.image_variants = {
+            '160': {'jpeg': self.recipe.image.name.replace('.', '_160.')},
+        }
+        self.recipe.save()
+
+    def tearDown(self):
+        self.recipe.image.delete()
+
+    def test_serve_image(self):
+        """Test the owner gets the image with long lived caching"""
+        res = self.client.get(self.recipe.image.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(res.streaming_content), b'image bytes')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('private', res['Cache-Control'])
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/')
+    def test_serve_image_with_accel_redirect(self):
+        """Test sending the file is handed off to nginx when configured"""
+        variant = self.recipe.image_variants['160']['jpeg']
+        url = reverse('recipe:media', args=[variant])
+
+        res = self.client.get(url, HTTP_ACCEPT='image/webp')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['X-Accel-Redirect'],
+            f'/protected-media/{variant}',
+        )
+        self.assertEqual(res.content, b'')
+        self.assertIn('immutable', res['Cache-Control'])
+
+    def test_serve_image_of_other_user_not_found(self):
+        """Test images of other users' recipes are not served"""
+        other_user = create_user(
+            email='other@example.com',
+            password='password123',
+        )
+        self.client.force_authenticate(other_user)
+
+        res = self.client.get(self.recipe.image.url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_serve_unknown_file_not_found(self):
+        """Test files which are not recipe images are not served"""
+        url = reverse('recipe:media', args=['uploads/recipe/../../secret'])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_serve_image_auth_required(self):
+        """Test images are only served to authenticated users"""
+        self.client.force_authenticate(None)
+
+        res = self.client.get(self.recipe.image.url)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RecipeQueryCountTests(TestCase):
+    """Test the number of queries run by the Recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tags = [
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+            for i in range(3)
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'Ingredient {i}')
+            for i in range(3)
+        ]
+
+    def _create_recipes(self, count):
+        """Create recipes with tags and ingredients in bulk"""
+        Recipe.objects.filter(user=self.user).delete()
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=Decimal('5.00'),
+            )
+            for i in range(count)
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes for tag in self.tags
+        ])
+        Recipe.ingredients.through.objects.bulk_create([
+            Recipe.ingredients.through(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient.id,
+            )
+            for recipe in recipes for ingredient in self.ingredients
+        ])
+        # The inserts above bypass the signals maintaining the counts.
+        for objs in [self.tags, self.ingredients]:
+            type(objs[0]).objects.filter(
+                pk__in=[obj.pk for obj in objs],
+            ).update(recipe_count=count)
+
+        return recipes
+
+    def test_list_recipes_query_count(self):
+        """Test listing recipes runs a constant number of queries"""
+        for count in [1, 50, 500]:
+            with self.subTest(count=count):
+                self._create_recipes(count)
+
+                # Recipes, tags and ingredients.
+                with self.assertNumQueries(3):
+                    res = self.client.get(RECIPES_URL, {'page_size': count})
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                results = res.data['results']
+                self.assertEqual(len(results), count)
+                self.assertEqual(len(results[0]['tags']), 3)
+                self.assertEqual(len(results[0]['ingredients']), 3)
+
+    def test_retrieve_recipe_query_count(self):
+        """Test retrieving a recipe runs a constant number of queries"""
+        recipe = self._create_recipes(1)[0]
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 3)
+
+    def test_update_recipe_query_count(self):
+        """Test updating a recipe does not query per related object"""
+        recipe = self._create_recipes(1)[0]
+
+        # Recipe with prefetches, update, then reloaded relations.
+        with self.assertNumQueries(6):
+            res = self.client.patch(detail_url(recipe.id), {'title': 'New'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['ingredients']), 3)
+
+    def test_create_recipe_with_nested_query_count(self):
+        """Test nested tags and ingredients are created in bulk"""
+        payload = {
+            'title': 'Big salad',
+            'time_minutes': 15,
+            'price': Decimal('9.50'),
+            'tags': [{'name': f'Tag {i}'} for i in range(20)],
+            'ingredients': [
+                {'name': f'Ingredient {i}'} for i in range(30)
+            ],
+        }
+
+        # Recipe insert, then for tags and ingredients each: select
+        # existing, insert missing, read them back, insert links, count
+        # them, touch the recipe and reload for response.
+        with self.assertNumQueries(15):
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 20)
+        self.assertEqual(recipe.ingredients.count(), 30)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 20)
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(),
+            30,
+        )
+
+    def test_update_recipe_with_nested_query_count(self):
+        """Test updating nested relations does not query per item"""
+        recipe = self._create_recipes(1)[0]
+        payload = {
+            'tags': [{'name': f'Tag {i}'} for i in range(20)],
+            'ingredients': [
+                {'name': f'Ingredient {i}'} for i in range(30)
+            ],
+        }
+
+        with self.assertNumQueries(18):
+            res = self.client.patch(
+                detail_url(recipe.id),
+                payload,
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(recipe.tags.count(), 20)
+        self.assertEqual(recipe.ingredients.count(), 30)
+
+    def test_noop_update_leaves_links_untouched(self):
+        """Test updating with unchanged tags writes no M2M rows"""
+        recipe = self._create_recipes(1)[0]
+        payload = {
+            'tags': [{'name': tag.name} for tag in self.tags],
+            'ingredients': [
+                {'name': ingredient.name} for ingredient in self.ingredients
+            ],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(recipe.id),
+                payload,
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in ctx.captured_queries:
+            self.assertFalse(query['sql'].startswith(('INSERT', 'DELETE')))
+        self.assertEqual(recipe.tags.count(), 3)
+        self.assertEqual(recipe.ingredients.count(), 3)
+
+    def test_update_only_changes_modified_links(self):
+        """Test updating tags keeps the links which did not change"""
+        recipe = self._create_recipes(1)[0]
+        through = Recipe.tags.through
+        kept = through.objects.get(recipe=recipe, tag=self.tags[0])
+        payload = {'tags': [{'name': self.tags[0].name}, {'name': 'New'}]}
+
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(through.objects.filter(id=kept.id).exists())
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {self.tags[0].name, 'New'},
+        )
+
+    def test_create_recipe_duplicate_tag_names(self):
+        """Test repeated tag names in a payload create one tag"""
+        payload = {
+            'title': 'Toast',
+            'time_minutes': 5,
+            'price': Decimal('1.50'),
+            'tags': [{'name': 'Breakfast'}, {'name': 'Breakfast'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        tags = Tag.objects.filter(user=self.user, name='Breakfast')
+        self.assertEqual(tags.count(), 1)
+        self.assertEqual(len(res.data['tags']), 1)
+
+    def test_list_sparse_fields(self):
+        """Test listing only some fields skips the other columns and joins"""
+        recipe = self._create_recipes(1)[0]
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'],
+            [{'id': recipe.id, 'title': recipe.title}],
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('time_minutes', queries[0]['sql'])
+
+    def test_list_without_expand(self):
+        """Test relations which are not expanded are returned as ids"""
+        self._create_recipes(1)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL, {'expand': 'tags'})
+
+        result = res.data['results'][0]
+        self.assertEqual(
+            [tag['name'] for tag in result['tags']],
+            [tag.name for tag in self.tags],
+        )
+        self.assertEqual(
+            result['ingredients'],
+            [ingredient.id for ingredient in self.ingredients],
+        )
+
+    def test_retrieve_sparse_fields(self):
+        """Test retrieving only some fields of a recipe"""
+        recipe = self._create_recipes(1)[0]
+
+        with self.assertNumQueries(2):
+            res = self.client.get(
+                detail_url(recipe.id),
+                {'fields': 'title,tags,image_variants', 'expand': ''},
+            )
+
+        self.assertEqual(res.data, {
+            'title': recipe.title,
+            'tags': [tag.id for tag in self.tags],
+            'image_variants': {},
+        })
+
+    def test_update_ignores_sparse_fields(self):
+        """Test the fields parameter does not limit what can be written"""
+        recipe = self._create_recipes(1)[0]
+        url = detail_url(recipe.id) + '?fields=title'
+
+        res = self.client.patch(url, {'tags': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(recipe.tags.exists())
@@ -0,0 +1,139 @@
+"""
+Tests for the recipe export API
+"""
+
+import csv
+from decimal import Decimal
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe Title',
+        'time_minutes': 30,
+        'price': Decimal('44.99'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def read_content(res):
+    """Return the decoded body of a streaming response"""
+    return b''.join(res.streaming_content).decode()
+
+
+class PublicRecipeExportAPITests(TestCase):
+    """Test unauthenticated export requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test authentication is required for exporting recipes"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeExportAPITests(TestCase):
+    """Test authenticated export requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_export_ndjson(self):
+        """Test exporting recipes with relations as NDJSON"""
+        recipe = create_recipe(user=self.user, title='Pad thai')
+        tag = Tag.objects.create(user=self.user, name='Thai')
+        ingredient = Ingredient.objects.create(user=self.user, name='Rice')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123',
+        )
+        create_recipe(user=other_user)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = read_content(res).splitlines()
+        self.assertEqual(len(lines), 1)
+        exported = json.loads(lines[0])
+        self.assertEqual(exported['id'], recipe.id)
+        self.assertEqual(exported['title'], 'Pad thai')
+        self.assertEqual(exported['price'], '44.99')
+        self.assertEqual(exported['tags'], [{'id': tag.id, 'name': 'Thai'}])
+        self.assertEqual(
+            exported['ingredients'],
+            [{'id': ingredient.id, 'name': 'Rice'}],
+        )
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV"""
+        recipe = create_recipe(user=self.user, title='Soup, hot')
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Lunch'),
+            Tag.objects.create(user=self.user, name='Dinner'),
+        )
+
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(read_content(res))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Soup, hot')
+        self.assertEqual(rows[0]['tags'], 'Dinner;Lunch')
+        self.assertEqual(rows[0]['ingredients'], '')
+
+    def test_export_invalid_format(self):
+        """Test exporting to an unknown format is rejected"""
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_export_queries_per_chunk(self):
+        """Test relations are loaded once per chunk of recipes"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        for i in range(5):
+            create_recipe(user=self.user, title=f'Recipe {i}').tags.add(tag)
+
+        res = self.client.get(EXPORT_URL)
+        # Recipes cursor, then tags and ingredients for each of 3 chunks.
+        with self.assertNumQueries(1 + 3 * 2):
+            lines = read_content(res).splitlines()
+
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])['title'], 'Recipe 4')
+        self.assertEqual(json.loads(lines[4])['tags'][0]['name'], 'Vegan')
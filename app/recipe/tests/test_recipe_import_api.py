@@ -0,0 +1,205 @@
+"""
+Tests for the bulk recipe import API
+"""
+
+from decimal import Decimal
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-import')
+
+
+def sample_payload(count, **params):
+    """Create and return a list of recipes to import"""
+    payload = []
+    for i in range(count):
+        recipe = {
+            'title': f'Recipe {i}',
+            'time_minutes': 10 + i,
+            'price': '5.50',
+            'tags': [{'name': 'Dinner'}, {'name': f'Tag {i % 5}'}],
+            'ingredients': [{'name': 'Salt'}, {'name': f'Ingredient {i}'}],
+        }
+        recipe.update(params)
+        payload.append(recipe)
+
+    return payload
+
+
+class PublicRecipeImportAPITests(TestCase):
+    """Test unauthenticated bulk import requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test authentication is required for importing recipes"""
+        res = self.client.post(BULK_URL, sample_payload(1), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeImportAPITests(TestCase):
+    """Test authenticated bulk import requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_import_json_array(self):
+        """Test importing recipes from a JSON array"""
+        existing = Tag.objects.create(user=self.user, name='Dinner')
+
+        res = self.client.post(BULK_URL, sample_payload(10), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(r['status'] == 'created' for r in results))
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 10)
+        recipe = recipes.get(id=results[3]['id'])
+        self.assertEqual(recipe.title, 'Recipe 3')
+        self.assertEqual(recipe.price, Decimal('5.50'))
+        self.assertIn(existing, recipe.tags.all())
+        self.assertEqual(recipe.ingredients.count(), 2)
+
+    def test_import_dedupes_names_across_batch(self):
+        """Test tags and ingredients are created once per name"""
+        with override_settings(RECIPE_IMPORT_CHUNK_SIZE=3):
+            res = self.client.post(
+                BULK_URL,
+                sample_payload(10),
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # Dinner plus Tag 0 to Tag 4.
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 6)
+        # Salt plus one ingredient per recipe.
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(),
+            11,
+        )
+        self.assertEqual(
+            Recipe.objects.filter(tags__name='Dinner').count(),
+            10,
+        )
+
+    def test_import_ndjson(self):
+        """Test importing recipes from NDJSON with per item errors"""
+        lines = [json.dumps(item) for item in sample_payload(2)]
+        lines.insert(1, '{not json')
+        lines.insert(2, json.dumps({'title': 'Missing fields'}))
+        body = '\n'.join(lines) + '\n'
+
+        res = self.client.post(
+            BULK_URL,
+            body,
+            content_type='application/x-ndjson',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual(
+            [r['status'] for r in results],
+            ['created', 'error', 'error', 'created'],
+        )
+        self.assertEqual([r['index'] for r in results], [0, 1, 2, 3])
+        self.assertIn('time_minutes', results[2]['errors'])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_import_ndjson_invalid_encoding(self):
+        """Test lines which cannot be decoded are reported as errors"""
+        lines = [json.dumps(item).encode() for item in sample_payload(1)]
+        lines.append(b'\xff\xfe{}')
+        body = b'\n'.join(lines) + b'\n'
+
+        res = self.client.post(
+            BULK_URL,
+            body,
+            content_type='application/x-ndjson',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['status'] for r in res.data['results']],
+            ['created', 'error'],
+        )
+
+    def test_import_requires_list(self):
+        """Test importing a single object is rejected"""
+        res = self.client.post(BULK_URL, sample_payload(1)[0], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_import_rejects_scalars(self):
+        """Test importing a JSON scalar is rejected"""
+        for body in ['5', 'null', 'true']:
+            res = self.client.post(
+                BULK_URL,
+                body,
+                content_type='application/json',
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMPORT_CHUNK_SIZE=50)
+    def test_import_queries_per_chunk(self):
+        """Test import runs a fixed number of queries per chunk"""
+        # First chunk: savepoint, recipe insert, select, insert and read
+        # back for tags and ingredients, two link inserts, two count
+        # updates each (one per distinct number of uses) and savepoint
+        # release. The second chunk reuses the tags resolved by the first.
+        with self.assertNumQueries(15 + 12):
+            res = self.client.post(
+                BULK_URL,
+                sample_payload(100),
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 100)
+
+    def test_import_cheaper_than_individual_posts(self):
+        """Test bulk import takes at least 20x fewer queries than POSTs"""
+        payload = sample_payload(100)
+        with CaptureQueriesContext(connection) as individual:
+            for item in payload:
+                self.client.post(RECIPES_URL, item, format='json')
+        Recipe.objects.all().delete()
+        Tag.objects.all().delete()
+        Ingredient.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as bulk:
+            self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 100)
+        self.assertGreaterEqual(
+            len(individual.captured_queries),
+            20 * len(bulk.captured_queries),
+        )
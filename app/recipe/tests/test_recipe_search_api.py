@@ -0,0 +1,154 @@
+"""
+Tests for searching recipes
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe Title',
+        'time_minutes': 30,
+        'price': Decimal('44.99'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def result_ids(res):
+    """Return the ids of the recipes in a list response"""
+    return [recipe['id'] for recipe in res.data['results']]
+
+
+class RecipeSearchAPITests(TestCase):
+    """Test the search query parameter of the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_search_title_and_description(self):
+        """Test recipes are matched on title and description"""
+        r1 = create_recipe(user=self.user, title='Thai Green Curry')
+        r2 = create_recipe(
+            user=self.user,
+            title='Weeknight Rice',
+            description='Serve with leftover curry.',
+        )
+        create_recipe(user=self.user, title='Porridge')
+
+        res = self.client.get(RECIPES_URL, {'search': 'curry'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(result_ids(res), [r1.id, r2.id])
+
+    def test_search_ranks_title_matches_first(self):
+        """Test matches in the title rank above matches in the description"""
+        r1 = create_recipe(
+            user=self.user,
+            title='Weeknight Rice',
+            description='Serve with leftover curry.',
+        )
+        r2 = create_recipe(user=self.user, title='Thai Green Curry')
+
+        res = self.client.get(RECIPES_URL, {'search': 'curry'})
+
+        self.assertEqual(result_ids(res), [r2.id, r1.id])
+
+    def test_search_prefix(self):
+        """Test partially typed words match"""
+        recipe = create_recipe(user=self.user, title='Chickpea Stew')
+        create_recipe(user=self.user, title='Lentil Stew')
+
+        res = self.client.get(RECIPES_URL, {'search': 'stew chick'})
+
+        self.assertEqual(result_ids(res), [recipe.id])
+
+    def test_search_stemming(self):
+        """Test different forms of a word match"""
+        recipe = create_recipe(user=self.user, title='Roasted Potatoes')
+
+        res = self.client.get(RECIPES_URL, {'search': 'potato'})
+
+        self.assertEqual(result_ids(res), [recipe.id])
+
+    def test_search_updated_recipe(self):
+        """Test changes to the title are picked up by the search"""
+        recipe = create_recipe(user=self.user, title='Soup')
+        recipe.title = 'Gazpacho'
+        recipe.save()
+
+        res = self.client.get(RECIPES_URL, {'search': 'gazpacho'})
+
+        self.assertEqual(result_ids(res), [recipe.id])
+
+    def test_search_ignores_query_syntax(self):
+        """Test tsquery operators in the search text are not interpreted"""
+        recipe = create_recipe(user=self.user, title='Fish & Chips')
+
+        res = self.client.get(RECIPES_URL, {'search': "fish & !(chips:*"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(result_ids(res), [recipe.id])
+
+    def test_search_without_words(self):
+        """Test a search without any words lists every recipe"""
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+
+        for search in ['', '&&', 'the and of']:
+            res = self.client.get(RECIPES_URL, {'search': search})
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(result_ids(res), [r2.id, r1.id])
+
+    def test_search_limited_to_user(self):
+        """Test other users' recipes are not found"""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123',
+        )
+        create_recipe(user=other_user, title='Thai Green Curry')
+
+        res = self.client.get(RECIPES_URL, {'search': 'curry'})
+
+        self.assertEqual(result_ids(res), [])
+
+    def test_search_paginated(self):
+        """Test ranked search results can be paged through"""
+        for i in range(3):
+            create_recipe(user=self.user, title=f'Curry {i}')
+            create_recipe(
+                user=self.user,
+                title=f'Rice {i}',
+                description='Good with curry.',
+            )
+
+        ids = []
+        res = self.client.get(RECIPES_URL, {'search': 'curry', 'page_size': 4})
+        ids.extend(result_ids(res))
+        res = self.client.get(res.data['next'])
+        ids.extend(result_ids(res))
+
+        expected = Recipe.objects.filter(title__startswith='Curry')
+        self.assertEqual(len(ids), 6)
+        self.assertCountEqual(ids[:3], expected.values_list('id', flat=True))
+        self.assertIsNone(res.data['next'])
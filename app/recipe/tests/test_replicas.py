@@ -0,0 +1,97 @@
+"""
+Tests for serving Recipe API reads from replicas
+"""
+
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+# The test database mirrors replicas on a separate connection, which does
+# not see the data of the test transaction, so the primary stands in.
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaReadTests(TestCase):
+    """Test which requests read from a replica"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        # Creating the user pinned them to the primary.
+        cache.clear()
+        self.client.force_authenticate(self.user)
+        patcher = patch(
+            'core.routers.use_replica',
+            wraps=routers.use_replica,
+        )
+        self.use_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_list_reads_from_replica(self):
+        """Test listing recipes reads from a replica"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.use_replica.assert_called_once()
+        # Reads after the request go back to the primary.
+        self.assertIsNone(routers.state.replica)
+
+    def test_create_reads_from_primary(self):
+        """Test unsafe requests do not read from a replica"""
+        payload = {
+            'title': 'Sample recipe',
+            'time_minutes': 30,
+            'price': Decimal('5.99'),
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.use_replica.assert_not_called()
+
+    def test_reads_after_change_from_primary(self):
+        """Test users read their own changes from the primary"""
+        self.client.post(RECIPES_URL, {
+            'title': 'Sample recipe',
+            'time_minutes': 30,
+            'price': Decimal('5.99'),
+        })
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.use_replica.assert_not_called()
+
+    def test_other_users_read_from_replica(self):
+        """Test changes only pin the user who made them"""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123',
+        )
+        Recipe.objects.create(
+            user=other,
+            title='Sample recipe',
+            time_minutes=30,
+            price=Decimal('5.99'),
+        )
+
+        self.client.get(RECIPES_URL)
+
+        self.use_replica.assert_called_once()
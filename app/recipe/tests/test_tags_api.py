@@ -3,6 +3,7 @@ Test for the Tags API
 """
 
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -20,6 +21,7 @@ from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse('recipe:tag-list')
+AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
 
 
 def detail_url(tag_id):
@@ -63,7 +65,7 @@ class PrivateTagsAPITests(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrieve_tags_limited_to_user(self):
         """Test retriving a list of tags limited to authenticated user."""
@@ -77,9 +79,32 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
-        self.assertEqual(res.data[0]['id'], tag.id)
+        results = res.data['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['name'], tag.name)
+        self.assertEqual(results[0]['id'], tag.id)
+
+    @patch('recipe.pagination.RecipeAttrCursorPagination.page_size', 2)
+    def test_tags_paginated_by_name(self):
+        """Test tags are paginated by name"""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        tag3 = Tag.objects.create(user=self.user, name='Dinner')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(
+            [tag['id'] for tag in res.data['results']],
+            [tag1.id, tag2.id],
+        )
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [tag['id'] for tag in res.data['results']],
+            [tag3.id],
+        )
+        self.assertIsNone(res.data['next'])
 
     def test_update_tag(self):
         """Test updating a tag"""
@@ -93,6 +118,17 @@ class PrivateTagsAPITests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name(self):
+        """Test renaming a tag to a name already in use is rejected"""
+        Tag.objects.create(user=self.user, name='Desserts')
+        tag = Tag.objects.create(user=self.user, name='Ice cream')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Desserts'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Ice cream')
+
     def test_delete_tag(self):
         """Test deleting a tag"""
         tag = Tag.objects.create(user=self.user, name='Lunch')
@@ -120,8 +156,8 @@ class PrivateTagsAPITests(TestCase):
 
         s1 = TagSerializer(tag1)
         s2 = TagSerializer(tag2)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filtered_tag_unique(self):
         """Test filtering tags returns a unique list"""
@@ -144,4 +180,62 @@ class PrivateTagsAPITests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_tags_with_counts(self):
+        """Test listing tags with the number of recipes using them"""
+        tag1 = Tag.objects.create(user=self.user, name='Dessert')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        for title in ['Panna cotta', 'Fruit crumble']:
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=100,
+                price=Decimal(15.25),
+                user=self.user,
+            )
+            recipe.tags.add(tag1)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL, {'with_counts': 1})
+
+        self.assertEqual(res.data['results'], [
+            {'id': tag2.id, 'name': 'Dinner', 'recipe_count': 0},
+            {'id': tag1.id, 'name': 'Dessert', 'recipe_count': 2},
+        ])
+
+    def test_tags_without_counts(self):
+        """Test recipe counts are only included when requested"""
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn('recipe_count', res.data['results'][0])
+
+    def test_autocomplete_tags(self):
+        """Test tags containing the text are suggested"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Dinner')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'fast'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [TagSerializer(tag).data])
+
+    def test_retrieve_tags_sparse_fields(self):
+        """Test listing only the ids of tags"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, {'fields': 'id'})
+
+        self.assertEqual(res.data['results'], [{'id': tag.id}])
+
+    def test_sparse_fields_paginated_queries(self):
+        """Test paging with sparse fields reads tags in one query"""
+        for name in ['Vegan', 'Dessert', 'Breakfast']:
+            Tag.objects.create(user=self.user, name=name)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL, {'fields': 'id', 'page_size': 2})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
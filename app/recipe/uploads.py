@@ -0,0 +1,141 @@
+"""
+Upload handling for recipe images
+"""
+
+from PIL import (
+    Image,
+    ImageFile,
+    ImageOps,
+    features,
+)
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+
+
+IMAGE_SIGNATURES = {
+    b'\xff\xd8\xff': 'JPEG',
+    b'\x89PNG\r\n\x1a\n': 'PNG',
+}
+
+# Bytes read at most before the image dimensions must be known.
+HEADER_LIMIT = 256 * 1024
+
+EXIF_ORIENTATION = 0x0112
+
+# Pillow only decodes WebP when it was built with libwebp.
+WEBP_SUPPORTED = features.check('webp')
+
+
+def sniff_format(header):
+    """Return the image format identified by the leading bytes"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP' if WEBP_SUPPORTED else None
+    for signature, image_format in IMAGE_SIGNATURES.items():
+        if header.startswith(signature):
+            return image_format
+
+    return None
+
+
+def strip_metadata(path, image_format):
+    """Rewrite an image file without EXIF and other metadata"""
+    with Image.open(path) as img:
+        img.load()
+        options = {}
+        if img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+            # Apply the orientation before dropping it with the EXIF data.
+            img = ImageOps.exif_transpose(img)
+            if image_format == 'JPEG':
+                options['quality'] = 90
+        elif image_format == 'JPEG':
+            # Reuse the original quantization tables to limit quality loss.
+            options['quality'] = 'keep'
+        img.save(path, format=image_format, **options)
+
+
+class RecipeImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream an uploaded image to disk, validating it while it arrives.
+
+    The format is checked from the magic bytes of the first chunk and the
+    pixel count from the header as soon as it has been received, so bad
+    uploads are rejected without reading or decoding the rest.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+
+    def new_file(self, *args, **kwargs):
+        """Start validating a new file"""
+        super().new_file(*args, **kwargs)
+        self.image_format = None
+        self._parser = ImageFile.Parser()
+        self._header_size = 0
+        self._header_checked = False
+
+    def _reject(self, error):
+        """Stop reading the request"""
+        self.error = error
+        raise StopUpload(connection_reset=True)
+
+    def _reject_too_large(self):
+        """Stop reading an image with too many pixels"""
+        self._reject(
+            f'The image must have at most '
+            f'{settings.RECIPE_IMAGE_MAX_PIXELS} pixels.'
+        )
+
+    def _check_header(self, raw_data, start):
+        """Validate the format and dimensions from the leading bytes"""
+        if start == 0:
+            self.image_format = sniff_format(raw_data)
+            if self.image_format is None:
+                self._reject(
+                    'Upload a JPEG, PNG or WebP image.' if WEBP_SUPPORTED
+                    else 'Upload a JPEG or PNG image.'
+                )
+
+        try:
+            self._parser.feed(raw_data)
+        except Image.DecompressionBombError:
+            # Raised by Pillow for headers far over its own pixel limit.
+            self._reject_too_large()
+        except (OSError, SyntaxError, ValueError):
+            self._reject('The image could not be read.')
+        self._header_size += len(raw_data)
+        if self._parser.image is None:
+            if self._header_size > HEADER_LIMIT:
+                self._reject('The image dimensions could not be read.')
+            return
+
+        width, height = self._parser.image.size
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self._reject_too_large()
+        self._header_checked = True
+
+    def receive_data_chunk(self, raw_data, start):
+        """Write the chunk to disk once the header is acceptable"""
+        if not self._header_checked:
+            self._check_header(raw_data, start)
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        """Strip metadata from the complete file"""
+        if not self._header_checked:
+            self._reject('The image dimensions could not be read.')
+
+        self.file.flush()
+        try:
+            strip_metadata(self.file.temporary_file_path(), self.image_format)
+        except (OSError, SyntaxError, ValueError,
+                Image.DecompressionBombError):
+            self._reject('The image could not be read.')
+
+        self.file.seek(0, 2)
+        return super().file_complete(self.file.tell())
@@ -21,5 +21,6 @@ router.register('ingredients', views.IngredientViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
+    path('media/<path:name>', views.RecipeMediaView.as_view(), name='media'),
     path('', include(router.urls))
 ]
@@ -2,73 +2,280 @@
 Views for the Recipe API
 """
 
+import re
+from types import GeneratorType
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
     OpenApiParameter,
     OpenApiTypes,
 )
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+)
+from django.db import (
+    IntegrityError,
+    transaction,
+)
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.cache import patch_vary_headers
 from rest_framework import (
     viewsets,
     mixins,
     status,
 )
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
 )
+from core.replicas import ReplicaReadMixin
 from recipe import serializers
+from recipe.autocomplete import autocomplete
+from recipe.caching import (
+    CachedListMixin,
+    ConditionalRetrieveMixin,
+)
+from recipe.exports import RecipeExporter
+from recipe.images import (
+    enqueue_variants,
+    find_recipe_by_image,
+    select_variant,
+)
+from recipe.imports import RecipeImporter
+from recipe.parsers import NDJSONParser
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeAttrCursorPagination,
+)
+from recipe.uploads import RecipeImageUploadHandler
+from user.authentication import CachedTokenAuthentication
+
+
+# Columns needed to serialize fields which are not a column themselves.
+RECIPE_FIELD_COLUMNS = {
+    'image_variants': ['image', 'image_variants'],
+}
+
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of fields to return',
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR,
+        description=(
+            'Comma separated list of nested objects to embed, the others '
+            'are returned as ids. All are embedded if omitted.'
+        ),
+    ),
+]
 
 
 @extend_schema_view(
     list=extend_schema(
-        parameters=[
+        parameters=SPARSE_FIELDS_PARAMETERS + [
             OpenApiParameter(
                 'tags',
                 OpenApiTypes.STR,
                 description='Comma separated list of tag IDs to filter'
             ),
+            OpenApiParameter(
+                'tags_match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='Match recipes with any (default) or all tags',
+            ),
             OpenApiParameter(
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter',
-            )
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Words or word prefixes in title or description',
+            ),
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELDS_PARAMETERS),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin,
+                    CachedListMixin,
+                    ConditionalRetrieveMixin,
+                    viewsets.ModelViewSet):
     """View to manage Recipe APIs"""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _filter_related(self, queryset, through, field, ids, match_all=False):
+        """Filter recipes linked to the given ids through an M2M table"""
+        links = through.objects.filter(**{f'{field}__in': ids})
+        if match_all:
+            # Recipes linked to every id; the through table is unique on
+            # (recipe, field) so the count per recipe is the number matched.
+            matched = links.values('recipe_id').annotate(
+                matched=Count(field),
+            ).filter(matched=len(set(ids))).values('recipe_id')
+            return queryset.filter(id__in=matched)
+
+        # Semi-join, so recipes matching several ids are not duplicated.
+        return queryset.filter(
+            Exists(links.filter(recipe_id=OuterRef('pk')))
+        )
+
+    def _search_query(self, text):
+        """Build a query matching every word of text as a prefix"""
+        words = re.findall(r'\w+', text)
+        if not words:
+            return None
+
+        return SearchQuery(
+            ' & '.join(f'{word}:*' for word in words),
+            config='english',
+            search_type='raw',
+        )
+
     def get_queryset(self):
         """Retrieve recipes for authenticated user"""
+        search = self.request.query_params.get('search')
         tags = self.request.query_params.get('tags')
+        tags_match = self.request.query_params.get('tags_match', 'any')
+        if tags_match not in ('any', 'all'):
+            raise ValidationError({'tags_match': 'Expected any or all.'})
         ingredients = self.request.query_params.get('ingredients')
         queryset = self.queryset
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-            # Django realted field filtering syntax
+            queryset = self._filter_related(
+                queryset,
+                Recipe.tags.through,
+                'tag_id',
+                tag_ids,
+                match_all=tags_match == 'all',
+            )
         if ingredients:
             ingredients_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_ids)
+            queryset = self._filter_related(
+                queryset,
+                Recipe.ingredients.through,
+                'ingredient_id',
+                ingredients_ids,
+            )
 
-        return queryset.filter(
+        queryset = queryset.filter(
             user=self.request.user
-        ).order_by('-id').distinct()
+        ).order_by('-id')
+
+        query = self._search_query(search or '')
+        if query is not None:
+            # A query of stopwords only has no terms and is treated like no
+            # search. Postgres folds the check to a constant, so real
+            # queries still use the GIN index.
+            queryset = queryset.alias(
+                search_terms=Func(
+                    query,
+                    function='numnode',
+                    output_field=IntegerField(),
+                ),
+            )
+            # Only matches get ranked. The rank is widened to double
+            # precision so the value a pagination cursor carries round
+            # trips exactly.
+            queryset = queryset.filter(
+                Q(search_vector=query) | Q(search_terms=0),
+            ).annotate(
+                rank=Case(
+                    When(search_terms=0, then=Value(0.0)),
+                    default=Cast(
+                        SearchRank(F('search_vector'), query),
+                        FloatField(),
+                    ),
+                    output_field=FloatField(),
+                ),
+            ).order_by('-rank', '-id')
+
+        if self.action in ['list', 'retrieve']:
+            return self._trim_queryset(queryset)
+
+        if self.action in ['update', 'partial_update']:
+            # Load nested tags and ingredients in one query each instead
+            # of two extra queries per serialized recipe.
+            queryset = queryset.prefetch_related('tags', 'ingredients')
+
+        return queryset
+
+    def _trim_queryset(self, queryset):
+        """Load only the columns and relations the response shows"""
+        fields = serializers.parse_field_list(
+            self.request.query_params.get('fields')
+        )
+        expand = serializers.parse_field_list(
+            self.request.query_params.get('expand')
+        )
+
+        if fields is None:
+            # The search vector is never serialized and can be large.
+            queryset = queryset.defer('search_vector')
+        else:
+            columns = {'id', 'updated_at'}
+            for name in fields:
+                columns.update(RECIPE_FIELD_COLUMNS.get(name, [name]))
+            concrete = {field.name for field in Recipe._meta.concrete_fields}
+            queryset = queryset.only(*(columns & concrete))
+
+        for relation, model in [('tags', Tag), ('ingredients', Ingredient)]:
+            if fields is not None and relation not in fields:
+                continue
+            if expand is not None and relation not in expand:
+                # Only the ids are returned, so only those are loaded.
+                queryset = queryset.prefetch_related(
+                    Prefetch(relation, queryset=model.objects.only('id')),
+                )
+            else:
+                queryset = queryset.prefetch_related(relation)
+
+        return queryset
 
     def get_serializer_class(self):
         """Return the serializer class for request"""
@@ -76,6 +283,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'bulk_import':
+            return serializers.RecipeImportSerializer
 
         return self.serializer_class
 
@@ -86,34 +295,147 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to recipe"""
+        upload_handler = RecipeImageUploadHandler(request)
+        request.upload_handlers = [upload_handler]
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
+        if upload_handler.error:
+            return Response(
+                {'image': [upload_handler.error]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         if serializer.is_valid():
-            serializer.save()
+            recipe = serializer.save()
+            enqueue_variants(recipe)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'width',
+                OpenApiTypes.INT,
+                description='Width the image is displayed at, in pixels',
+            ),
+        ],
+        responses={302: None},
+    )
+    @action(methods=['GET'], detail=True, url_path='image')
+    def image(self, request, pk=None):
+        """Redirect to the smallest recipe image wide enough to display"""
+        recipe = self.get_object()
+        if not recipe.image:
+            raise Http404
+
+        width = request.query_params.get('width')
+        try:
+            width = int(width) if width else None
+        except ValueError:
+            return Response(
+                {'width': 'A valid integer is required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        name = select_variant(
+            recipe,
+            width,
+            webp='image/webp' in request.META.get('HTTP_ACCEPT', ''),
+        )
+        response = HttpResponseRedirect(
+            request.build_absolute_uri(recipe.image.storage.url(name))
+        )
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    @extend_schema(
+        request=serializers.RecipeImportSerializer(many=True),
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='bulk',
+        parser_classes=[JSONParser, NDJSONParser],
+    )
+    def bulk_import(self, request):
+        """Import many recipes from a JSON array or NDJSON lines"""
+        items = request.data
+        # Lists come from JSON bodies, generators from NDJSON ones.
+        if not isinstance(items, (list, GeneratorType)):
+            return Response(
+                {'detail': 'Expected a list of recipes.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = RecipeImporter(request.user).run(items)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'export_format',
+                OpenApiTypes.STR, enum=['ndjson', 'csv'],
+                description='Format of the export, defaults to ndjson',
+            ),
+        ],
+        responses={200: OpenApiTypes.BINARY},
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all recipes of the user as NDJSON or CSV"""
+        export_format = request.query_params.get('export_format', 'ndjson')
+        exporter = RecipeExporter(self.get_queryset())
+        if export_format == 'csv':
+            content, content_type = exporter.iter_csv(), 'text/csv'
+        elif export_format == 'ndjson':
+            content = exporter.iter_ndjson()
+            content_type = 'application/x-ndjson'
+        else:
+            return Response(
+                {'detail': 'Unsupported export format.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_format}"'
+        )
+        return response
+
 
 @extend_schema_view(
     list=extend_schema(
-        parameters=[
+        parameters=SPARSE_FIELDS_PARAMETERS[:1] + [
             OpenApiParameter(
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes'
-            )
+            ),
+            OpenApiParameter(
+                'with_counts',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Include the number of recipes using each item',
+            ),
         ]
     )
 )
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(ReplicaReadMixin,
+                            CachedListMixin,
+                            mixins.DestroyModelMixin,
                             mixins.ListModelMixin,
                             mixins.UpdateModelMixin,
                             viewsets.GenericViewSet):
     """Base viewset for recipe attributes"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
+
+    def _with_counts(self):
+        """Return whether recipe counts were requested"""
+        return bool(int(self.request.query_params.get('with_counts', 0)))
 
     def get_queryset(self):
         """Filter the queryset to the authencticated user"""
@@ -122,20 +444,133 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(recipe_count__gt=0)
+
+        fields = serializers.parse_field_list(
+            self.request.query_params.get('fields')
+        )
+        if self.action == 'list' and fields is not None:
+            # The cursor pagination orders by name and reads it from rows.
+            queryset = queryset.only(
+                *({'id', 'name'} | fields & {'recipe_count'})
+            )
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by('-name', 'id')
+
+    def get_serializer_class(self):
+        """Return the serializer class for request"""
+        if self.action == 'list' and self._with_counts():
+            return self.count_serializer_class
+
+        return self.serializer_class
+
+    def perform_update(self, serializer):
+        """Update the item, rejecting a name the user already has"""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {'name': ['An item with this name already exists.']}
+            )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                required=True,
+                description='Text to find in names',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of matches to return',
+            ),
+        ],
+    )
+    @action(methods=['GET'], detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """Return the best matches for names containing q"""
+        q = request.query_params.get('q', '').strip()
+        if not q:
+            return Response(
+                {'q': 'This parameter is required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = int(request.query_params.get(
+                'limit',
+                settings.AUTOCOMPLETE_LIMIT,
+            ))
+        except ValueError:
+            return Response(
+                {'limit': 'A valid integer is required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, settings.AUTOCOMPLETE_MAX_LIMIT))
+
+        matches = autocomplete(
+            self.queryset.filter(user=request.user),
+            q,
+            limit,
+        )
+        serializer = self.get_serializer(matches, many=True)
+        return Response(serializer.data)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """View to manage tags in the database"""
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
     queryset = Tag.objects.all()
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database"""
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
     queryset = Ingredient.objects.all()
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Use the first renderer, whatever the client accepts"""
+
+    def select_parser(self, request, parsers):
+        """Select the first parser"""
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        """Select the first renderer"""
+        return (renderers[0], renderers[0].media_type)
+
+
+class RecipeMediaView(ReplicaReadMixin, APIView):
+    """Serve recipe images to the owner of the recipe"""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    # Image requests accept image types, which no renderer produces.
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    @extend_schema(responses={200: OpenApiTypes.BINARY})
+    def get(self, request, name):
+        """Return the image, or have nginx send it when configured"""
+        recipe = find_recipe_by_image(request.user, name)
+        if recipe is None:
+            raise Http404
+
+        if settings.MEDIA_ACCEL_REDIRECT:
+            response = HttpResponse()
+            # Let nginx set the type from the file extension.
+            del response['Content-Type']
+            response['X-Accel-Redirect'] = (
+                f'{settings.MEDIA_ACCEL_REDIRECT.rstrip("/")}/{name}'
+            )
+        else:
+            response = FileResponse(recipe.image.storage.open(name))
+
+        # Image names are never reused, so a copy can be kept for good.
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
@@ -0,0 +1,68 @@
+"""
+Authentication for the API
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def token_cache_key(key):
+    """Return the cache key of an auth token"""
+    return f'auth-token:{key}'
+
+
+def invalidate_token_cache(key):
+    """Drop an auth token and its user from the cache"""
+    cache.delete(token_cache_key(key))
+
+
+def token_age(token, now=None):
+    """Return how long ago the token was created or last refreshed"""
+    return (now or timezone.now()) - token.created
+
+
+def token_expired(token, now=None):
+    """Return whether the token is too old to be accepted"""
+    return token_age(token, now) > timedelta(seconds=settings.AUTH_TOKEN_TTL)
+
+
+def refresh_token(token, now=None):
+    """Restart the lifetime of the token if it is due, returning if it was"""
+    now = now or timezone.now()
+    refresh_after = timedelta(seconds=settings.AUTH_TOKEN_REFRESH_AFTER)
+    if token_age(token, now) <= refresh_after:
+        return False
+
+    token.created = now
+    Token.objects.filter(key=token.key).update(created=now)
+    return True
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication caching the token and user lookup"""
+
+    def authenticate_credentials(self, key):
+        """Return the user and token, from the cache when possible"""
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+
+        # The creation time is loaded with the token, so checking it needs
+        # no query. Only a refresh writes, once per refresh interval.
+        now = timezone.now()
+        if token_expired(token, now):
+            raise AuthenticationFailed(_('Token has expired.'))
+        if refresh_token(token, now):
+            cache.set(cache_key, token, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+
+        return (token.user, token)
@@ -0,0 +1,73 @@
+"""
+Password hashers for the user API
+"""
+
+import threading
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.pools import thread_pool
+
+
+# Bounds the CPU a worker spends hashing, whatever the number of logins.
+executor = thread_pool('password-hash', settings.PASSWORD_HASH_WORKERS)
+# Hashes being computed or waiting for a pool thread.
+pending = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_PENDING)
+local = threading.local()
+
+
+class HashingBusy(APIException):
+    """Too many passwords are being hashed to take another one"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many logins in progress, try again shortly.')
+    default_code = 'hashing_busy'
+
+
+def _run_in_pool(func, args):
+    """Run func on a pool thread, marking the thread as hashing"""
+    local.in_pool = True
+    return func(*args)
+
+
+def run_hashing(func, *args):
+    """Run a hash computation on the pool, waiting a bounded time for it"""
+    if getattr(local, 'in_pool', False):
+        # PBKDF2 verifies by encoding, which must not queue up again.
+        return func(*args)
+
+    if not pending.acquire(timeout=settings.PASSWORD_HASH_WAIT):
+        raise HashingBusy()
+    try:
+        # Both argon2 and hashlib release the GIL while hashing, so request
+        # threads keep serving other requests meanwhile.
+        return executor.submit(_run_in_pool, func, args).result()
+    finally:
+        pending.release()
+
+
+class PooledHasherMixin:
+    """Compute hashes on the hashing pool"""
+
+    def encode(self, password, salt, *args):
+        """Hash the password on the pool"""
+        return run_hashing(super().encode, password, salt, *args)
+
+    def verify(self, password, encoded):
+        """Check the password on the pool"""
+        return run_hashing(super().verify, password, encoded)
+
+
+class Argon2PasswordHasher(PooledHasherMixin, hashers.Argon2PasswordHasher):
+    """Argon2 hasher with costs from the settings"""
+    time_cost = settings.ARGON2_TIME_COST
+    memory_cost = settings.ARGON2_MEMORY_COST
+    parallelism = settings.ARGON2_PARALLELISM
+
+
+class PBKDF2PasswordHasher(PooledHasherMixin, hashers.PBKDF2PasswordHasher):
+    """PBKDF2 hasher computing on the hashing pool"""
@@ -0,0 +1,40 @@
+"""
+Signal handlers for the user app
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_save,
+    post_delete,
+)
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core.routers import pin_to_primary
+from user.authentication import invalidate_token_cache
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token from the cache"""
+    invalidate_token_cache(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def pin_changed_user(sender, instance, **kwargs):
+    """Read the user from the primary until replicas have the change"""
+    pin_to_primary(instance.id)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_token(sender, instance, created, **kwargs):
+    """Reload a user changed, deactivated or given a new password"""
+    if created:
+        return
+
+    for key in Token.objects.filter(user=instance).values_list(
+        'key',
+        flat=True,
+    ):
+        invalidate_token_cache(key)
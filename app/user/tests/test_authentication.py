@@ -0,0 +1,172 @@
+"""
+Tests for the cached token authentication
+"""
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import token_cache_key
+
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating requests with cached tokens"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='password123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test the token is only looked up on the first request"""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is not authenticated"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token is dropped from the cache"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user is dropped from the cache"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_update_reloads_user(self):
+        """Test changes to the user are visible on the next request"""
+        self.client.get(ME_URL)
+
+        res = self.client.patch(
+            ME_URL,
+            {'name': 'Updated name', 'password': 'newpassword123'},
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.data['name'], 'Updated name')
+
+    def _age_token(self, **kwargs):
+        """Move the creation time of the token into the past"""
+        Token.objects.filter(key=self.token.key).update(
+            created=timezone.now() - timedelta(**kwargs),
+        )
+
+    @override_settings(AUTH_TOKEN_TTL=3600)
+    def test_expired_token_rejected(self):
+        """Test a token older than its lifetime is not authenticated"""
+        self._age_token(hours=2)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_TTL=3600)
+    def test_cached_token_expires(self):
+        """Test a cached token is rejected once it expires"""
+        self.client.get(ME_URL)
+        token = cache.get(token_cache_key(self.token.key))
+        token.created -= timedelta(hours=2)
+        cache.set(token_cache_key(self.token.key), token)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_TTL=3600, AUTH_TOKEN_REFRESH_AFTER=600)
+    def test_token_refreshed_when_used(self):
+        """Test using a token past its refresh age extends its lifetime"""
+        self._age_token(minutes=20)
+
+        # Token lookup, then the refresh.
+        with self.assertNumQueries(2):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.token.refresh_from_db()
+        self.assertLess(
+            timezone.now() - self.token.created,
+            timedelta(minutes=1),
+        )
+        with self.assertNumQueries(0):
+            self.client.get(ME_URL)
+
+
+class TokenLoginTests(TestCase):
+    """Test creating tokens by logging in"""
+
+    def setUp(self):
+        self.payload = {
+            'email': 'test@example.com',
+            'password': 'password123',
+        }
+        self.user = get_user_model().objects.create_user(**self.payload)
+        self.client = APIClient()
+
+    def test_login_reuses_token(self):
+        """Test logging in again returns the existing token"""
+        token = Token.objects.create(user=self.user)
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['token'], token.key)
+
+    @override_settings(AUTH_TOKEN_TTL=3600)
+    def test_login_replaces_expired_token(self):
+        """Test logging in with an expired token issues a new one"""
+        token = Token.objects.create(user=self.user)
+        Token.objects.filter(key=token.key).update(
+            created=timezone.now() - timedelta(hours=2),
+        )
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], token.key)
+        self.assertFalse(Token.objects.filter(key=token.key).exists())
@@ -0,0 +1,106 @@
+"""
+Tests for password hashing
+"""
+
+from importlib.util import find_spec
+from unittest import skipIf
+from unittest.mock import patch
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    get_hashers,
+    identify_hasher,
+    make_password,
+)
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import hashers
+
+
+TOKEN_URL = reverse('user:token')
+
+
+class PasswordHashingTests(TestCase):
+    """Test hashing passwords on the hashing pool"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.payload = {
+            'email': 'test@example.com',
+            'password': 'test-user-password123',
+        }
+        self.user = get_user_model().objects.create_user(**self.payload)
+
+    def test_legacy_hash_upgraded_on_login(self):
+        """Test logging in rehashes passwords with the preferred hasher"""
+        self.user.password = make_password(
+            self.payload['password'],
+            hasher='pbkdf2_sha1',
+        )
+        self.user.save()
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(
+            identify_hasher(self.user.password).algorithm,
+            get_hashers()[0].algorithm,
+        )
+        self.assertTrue(self.user.check_password(self.payload['password']))
+
+    def test_hashing_runs_on_pool(self):
+        """Test hashes are computed on the hashing threads"""
+        threads = []
+        run_in_pool = hashers._run_in_pool
+
+        def record_thread(func, args):
+            threads.append(threading.current_thread().name)
+            return run_in_pool(func, args)
+
+        with patch('user.hashers._run_in_pool', side_effect=record_thread):
+            res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(threads)
+        self.assertTrue(all(
+            name.startswith('password-hash') for name in threads
+        ))
+
+    @override_settings(PASSWORD_HASH_WAIT=0)
+    def test_login_rejected_when_hashing_busy(self):
+        """Test logins are turned away while the hashing pool is full"""
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+
+        with patch('user.hashers.pending', full):
+            res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_pending_limit_below_request_threads(self):
+        """Test hashing cannot hold every request thread of a worker"""
+        threads = int(os.environ.get('UWSGI_THREADS', 4))
+
+        self.assertLess(settings.PASSWORD_HASH_MAX_PENDING, threads)
+
+    @skipIf(find_spec('argon2') is None, 'argon2-cffi is not installed')
+    def test_argon2_costs_from_settings(self):
+        """Test new passwords are hashed with the configured Argon2 costs"""
+        hasher = get_hashers()[0]
+        encoded = make_password('password123')
+        decoded = hasher.decode(encoded)
+
+        self.assertEqual(hasher.algorithm, 'argon2')
+        self.assertEqual(decoded['time_cost'], settings.ARGON2_TIME_COST)
+        self.assertEqual(decoded['memory_cost'], settings.ARGON2_MEMORY_COST)
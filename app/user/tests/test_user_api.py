@@ -2,13 +2,21 @@
 Tests for the user API
 """
 
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import (
+    TestCase,
+    override_settings,
+)
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core import routers
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
@@ -148,3 +156,20 @@ class PrivateUserAPITests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_profile_read_after_update_from_primary(self):
+        """Test reading the profile right after changing it skips replicas"""
+        cache.clear()
+        with patch(
+            'core.routers.use_replica',
+            wraps=routers.use_replica,
+        ) as use_replica:
+            self.client.get(ME_URL)
+            self.assertEqual(use_replica.call_count, 1)
+
+            self.client.patch(ME_URL, {'name': 'New Name'})
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
+        self.assertEqual(use_replica.call_count, 1)
@@ -2,10 +2,19 @@
 Views for the user API
 """
 
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.replicas import ReplicaReadMixin
+
+from user.authentication import (
+    CachedTokenAuthentication,
+    refresh_token,
+    token_expired,
+)
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
@@ -23,11 +32,28 @@ class CreateTokenView(ObtainAuthToken):
     render_classes = api_settings.DEFAULT_RENDERER_CLASSES
     # Thanks to this (line 23), Django redners the view
 
+    def post(self, request, *args, **kwargs):
+        """Return the user's token, replacing it if it expired"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+
+        token, created = Token.objects.get_or_create(user=user)
+        if not created:
+            if token_expired(token):
+                # A leaked expired key must not become valid again.
+                token.delete()
+                token = Token.objects.create(user=user)
+            else:
+                refresh_token(token)
+
+        return Response({'token': token.key})
+
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ReplicaReadMixin, generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
@@ -1,10 +1,22 @@
 server {
     listen ${LISTEN_PORT};
 
+    # Media is only served to its owner, through the app.
+    location /static/media {
+        return 404;
+    }
+
     location /static {
         alias /vol/static;
     }
 
+    # Files the app allowed with X-Accel-Redirect. The app's Cache-Control
+    # header is kept on the response.
+    location /protected-media/ {
+        internal;
+        alias /vol/static/media/;
+    }
+
     location / {
         uwsgi_pass              ${APP_HOST}:${APP_PORT};
         include                 /etc/nginx/uwsgi_params;
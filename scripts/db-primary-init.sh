@@ -0,0 +1,7 @@
+#!/bin/sh
+
+set -e
+
+# Let the replica stream changes from the primary. Only runs when the
+# primary's data volume is first created.
+echo "host replication all all md5" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,17 @@
+#!/bin/sh
+
+set -e
+
+# Copy the primary and start following it as a hot standby. Only copies
+# when the replica's data volume is empty.
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until pg_basebackup --pgdata="$PGDATA" --host="$PRIMARY_HOST" \
+        --username="$POSTGRES_USER" --wal-method=stream \
+        --write-recovery-conf; do
+        echo "Waiting for primary..."
+        sleep 1
+    done
+    chmod 700 "$PGDATA"
+fi
+
+exec postgres